@@ -0,0 +1,270 @@
+# -*- encoding: utf-8 -*-
+"""Cache keys for rendered pages.
+
+Rather than deleting cache entries, we include a *generation* number in the
+key.  Changing the generation (``invalidate_page`` or ``invalidate_site``)
+means the old entries are never read again (and will expire).
+
+The generations are kept in the cache, so the page cache should use a cache
+which is shared by all of the processes e.g. memcached or redis.  The cache
+is selected using the ``BLOCK_CACHE_ALIAS`` setting (defaults to
+``default``).
+
+To cache rendered pages, set ``BLOCK_PAGE_CACHE_TIMEOUT`` to the number of
+seconds.  The default (``0``) disables the page cache.
+
+The ``block_section_cache`` template tag caches the HTML for one section
+(``BLOCK_SECTION_CACHE_TIMEOUT``, defaults to 300 seconds).  The key
+includes the content version of the page section (``PageSection.version``).
+
+To cache the menu tree (``Menu.objects.menu_tree``), set
+``BLOCK_MENU_CACHE_TIMEOUT`` to the number of seconds.  The default (``0``)
+disables the menu cache (as for the page cache, the generations must be
+shared by all of the processes).
+
+``page_version`` (the site and page generations, and the time they last
+changed) is used for conditional GET (``ETag`` and ``Last-Modified``).
+
+The item count for a keyset paginated section is cached for
+``BLOCK_SECTION_COUNT_TIMEOUT`` seconds (defaults to 300).
+
+``thumbnail_queue_add`` stops the image forms queueing the same thumbnail
+task more than once in ``BLOCK_THUMBNAIL_QUEUE_TIMEOUT`` seconds (defaults
+to 300).
+
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+SITE = 'site'
+
+
+def _cache():
+    return caches[getattr(settings, 'BLOCK_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(*args):
+    return 'block.generation.{}'.format(
+        '.'.join([str(x) for x in args])
+    )
+
+
+def _new_generation():
+    """Start from the current time, so a generation is never re-used.
+
+    The cache might lose a generation (e.g. if it is restarted), so we don't
+    want to start counting from ``1`` again.
+
+    """
+    return int(time.time() * 1000)
+
+
+def _generations(*keys):
+    cache = _cache()
+    result = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in result}
+    if missing:
+        modified = int(time.time())
+        cache.set_many(missing, None)
+        cache.set_many({_modified_key(key): modified for key in missing}, None)
+        result.update(missing)
+    return [result[key] for key in keys]
+
+
+def _bump(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # the key is not in the cache
+        cache.set(key, _new_generation(), None)
+    cache.set(_modified_key(key), int(time.time()), None)
+
+
+def _modified_key(key):
+    """When the generation last changed (seconds since the epoch)."""
+    return '{}.modified'.format(key)
+
+
+def _hash_key(prefix, *args):
+    value = '.'.join([str(x) for x in args])
+    return '{}.{}'.format(
+        prefix, hashlib.md5(value.encode('utf-8')).hexdigest()
+    )
+
+
+def invalidate_page(page):
+    """Content on the page has changed.
+
+    The footer page is displayed on every page, so changing the footer
+    invalidates the whole site.
+
+    """
+    # avoid a circular import
+    from block.models import Page
+    if page.slug == Page.CUSTOM and page.slug_menu == Page.FOOTER:
+        invalidate_site()
+    else:
+        _bump(_generation_key('page', page.slug, page.slug_menu))
+
+
+def invalidate_section(page_section):
+    """Content in the page section has been published or removed."""
+    _bump(_generation_key('section', page_section.pk))
+
+
+def invalidate_site():
+    """Something used by every page has changed e.g. the menu or footer."""
+    _bump(_generation_key(SITE))
+
+
+def invalidate_on_commit(func):
+    """Invalidate now, and again when the current transaction commits.
+
+    A request in another process could cache the old content after we
+    invalidate, but before our transaction commits.
+
+    """
+    func()
+    transaction.on_commit(func)
+
+
+def menu_cache_get(key):
+    return _cache().get(key)
+
+
+def menu_cache_key(menu_slug):
+    site, = _generations(_generation_key(SITE))
+    return _hash_key('block.menu', site, menu_slug)
+
+
+def menu_cache_set(key, value):
+    _cache().set(key, value, menu_cache_timeout())
+
+
+def menu_cache_timeout():
+    return getattr(settings, 'BLOCK_MENU_CACHE_TIMEOUT', 0)
+
+
+def page_cache_get(key):
+    return _cache().get(key)
+
+
+def page_cache_key(slug, slug_menu, page_number):
+    site, page = _generations(
+        _generation_key(SITE),
+        _generation_key('page', slug, slug_menu),
+    )
+    return _hash_key(
+        'block.page', site, page, slug, slug_menu, page_number or ''
+    )
+
+
+def page_version(slug, slug_menu):
+    """The version of the page, and when it was last modified.
+
+    The last modified time is ``None`` if it isn't in the cache.
+
+    """
+    keys = [_generation_key(SITE), _generation_key('page', slug, slug_menu)]
+    version = '.'.join([str(x) for x in _generations(*keys)])
+    modified = _cache().get_many([_modified_key(key) for key in keys])
+    if len(modified) == len(keys):
+        return version, max(modified.values())
+    return version, None
+
+
+def page_cache_set(key, response):
+    _cache().set(key, response, page_cache_timeout())
+
+
+def page_cache_timeout():
+    return getattr(settings, 'BLOCK_PAGE_CACHE_TIMEOUT', 0)
+
+
+def section_cache_get(key):
+    return _cache().get(key)
+
+
+def section_cache_key(page_section_pk, page_number, version=None):
+    """``version`` is the content version of the page section.
+
+    The version is stored in the database, so the key changes even if the
+    cache loses the section generation.
+
+    """
+    site, section = _generations(
+        _generation_key(SITE),
+        _generation_key('section', page_section_pk),
+    )
+    return _hash_key(
+        'block.section',
+        site,
+        section,
+        page_section_pk,
+        version or '',
+        page_number or '',
+    )
+
+
+def section_cache_set(key, value, timeout=None):
+    if timeout is None:
+        timeout = section_cache_timeout()
+    _cache().set(key, value, timeout)
+
+
+def section_cache_timeout():
+    return getattr(settings, 'BLOCK_SECTION_CACHE_TIMEOUT', 300)
+
+
+def section_count_get(key):
+    return _cache().get(key)
+
+
+def section_count_key(page_section_pk, moderate_state, version=None):
+    """``version`` is the content version of the page section.
+
+    The version is stored in the database, so (as for ``section_cache_key``)
+    the key changes even if this process has an old section generation.
+
+    """
+    section, = _generations(_generation_key('section', page_section_pk))
+    return _hash_key(
+        'block.section.count',
+        section,
+        page_section_pk,
+        moderate_state,
+        version or '',
+    )
+
+
+def section_count_set(key, value):
+    _cache().set(key, value, section_count_timeout())
+
+
+def section_count_timeout():
+    return getattr(settings, 'BLOCK_SECTION_COUNT_TIMEOUT', 300)
+
+
+def _thumbnail_queue_key(image_pk):
+    return 'block.thumbnail.queue.{}'.format(image_pk)
+
+
+def thumbnail_queue_add(image_pk):
+    """Returns ``False`` if the thumbnail task is already queued."""
+    return _cache().add(
+        _thumbnail_queue_key(image_pk), True, thumbnail_queue_timeout()
+    )
+
+
+def thumbnail_queue_delete(image_pk):
+    _cache().delete(_thumbnail_queue_key(image_pk))
+
+
+def thumbnail_queue_timeout():
+    return getattr(settings, 'BLOCK_THUMBNAIL_QUEUE_TIMEOUT', 300)
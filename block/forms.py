@@ -1,13 +1,16 @@
 # -*- encoding: utf-8 -*-
+import logging
+
 from django import forms
+from django.conf import settings
 from django.utils.html import format_html
-from easy_thumbnails.files import get_thumbnailer
 
 from base.form_utils import (
     FileDropInput,
     RequiredFieldForm,
     set_widget_required,
 )
+from block.cache import thumbnail_queue_add, thumbnail_queue_delete
 from block.models import (
     ContentModel,
     Document,
@@ -23,16 +26,51 @@ from block.models import (
     Template,
     TemplateSection,
 )
+from block.tasks import thumbnail_image
+
+
+logger = logging.getLogger(__name__)
+
+# displayed while the thumbnail is created (see ``_thumbnail_url``)
+THUMBNAIL_PLACEHOLDER = (
+    "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' "
+    "width='100' height='75'%3E%3Crect width='100' height='75' "
+    "fill='%23ddd'/%3E%3C/svg%3E"
+)
+
+
+def _thumbnail_url(image):
+    """The wizard thumbnail (created by the ``thumbnail_image`` task).
+
+    If the thumbnail doesn't exist (yet), then queue the task and return a
+    placeholder, so we don't create the thumbnail during the request.  The
+    task is only queued once (see ``thumbnail_queue_add``), and if the
+    broker is not available, we still display the form.
+
+    """
+    url = image.thumbnail_url(Image.WIZARD_THUMBNAIL)
+    if url is None:
+        if thumbnail_queue_add(image.pk):
+            try:
+                thumbnail_image.delay(image.pk)
+            except Exception:
+                logger.exception(
+                    'Cannot queue the thumbnail for image {}'.format(image.pk)
+                )
+                # try again next time
+                thumbnail_queue_delete(image.pk)
+        url = getattr(
+            settings, 'BLOCK_THUMBNAIL_PLACEHOLDER', THUMBNAIL_PLACEHOLDER
+        )
+    return url
 
 
 def _label_from_instance(obj):
-    """The label is the image."""
-    thumbnailer = get_thumbnailer(obj.image)
-    thumbnail_options = {
-        'crop': True,
-        'size': (100, 0),
-    }
-    thumbnail = thumbnailer.get_thumbnail(thumbnail_options)
+    """The label is the image.
+
+    The queryset should use ``prefetch_related('tags')``.
+
+    """
     html = """
         {}
         <br>
@@ -44,24 +82,18 @@ def _label_from_instance(obj):
     """
     return format_html(html.format(
         obj.title,
-        thumbnail.url,
+        _thumbnail_url(obj),
         obj.original_file_name,
-        ', '.join(obj.tags.names()),
+        ', '.join([tag.name for tag in obj.tags.all()]),
     ))
 
 
 def _label_from_many_to_many_instance(obj):
     """The label is the image."""
-    thumbnailer = get_thumbnailer(obj.image.image)
-    thumbnail_options = {
-        'crop': True,
-        'size': (100, 0),
-    }
-    thumbnail = thumbnailer.get_thumbnail(thumbnail_options)
     return format_html('{}. {}<br><img src="{}" />'.format(
         obj.order,
         obj.image.title,
-        thumbnail.url,
+        _thumbnail_url(obj.image),
     ))
 
 
@@ -307,7 +339,7 @@ class ImageListForm(forms.Form):
         image_queryset = kwargs.pop('image_queryset')
         super().__init__(*args, **kwargs)
         images = self.fields['images']
-        images.queryset = image_queryset
+        images.queryset = image_queryset.prefetch_related('tags')
 
     class Meta:
         model = Image
@@ -329,7 +361,11 @@ class ImageMultiSelectForm(forms.Form):
         image_queryset = kwargs.pop('image_queryset')
         super().__init__(*args, **kwargs)
         images = self.fields['images']
-        images.queryset = Image.objects.filter(pk__in=image_queryset)
+        images.queryset = Image.objects.filter(
+            pk__in=image_queryset
+        ).prefetch_related(
+            'tags',
+        )
 
     class Meta:
         fields = (
@@ -351,7 +387,11 @@ class ImageSelectForm(forms.Form):
         qs_many_to_many = kwargs.pop('many_to_many')
         super().__init__(*args, **kwargs)
         many_to_many = self.fields['many_to_many']
-        many_to_many.queryset = qs_many_to_many.order_by('order')
+        many_to_many.queryset = qs_many_to_many.select_related(
+            'image',
+        ).order_by(
+            'order',
+        )
         # tick every link - so the user can untick the ones they want to remove
         initial = {item.pk: True for item in qs_many_to_many}
         many_to_many.initial = initial
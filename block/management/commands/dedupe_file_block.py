@@ -0,0 +1,121 @@
+# -*- encoding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from block.models import Document, Image, file_hash
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Calculate the content hash for images and documents, and use one "
+        "file for rows with the same content"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the duplicates (but do not change anything)',
+        )
+        parser.add_argument(
+            '--delete-files',
+            action='store_true',
+            help='Delete the files which are no longer used',
+        )
+
+    def _content_hash(self, model, field_name, dry_run):
+        """Calculate the hash for rows uploaded before we stored it.
+
+        Returns a dict of primary key and hash (for a dry run, the hashes
+        are not saved).
+
+        """
+        result = {}
+        qs = model.objects.filter(content_hash='').exclude(
+            **{field_name: ''}
+        ).exclude(
+            **{'{}__isnull'.format(field_name): True}
+        )
+        for obj in qs.iterator():
+            field_file = getattr(obj, field_name)
+            if not field_file.storage.exists(field_file.name):
+                self.stderr.write('{} {}: missing file {}'.format(
+                    model._meta.model_name, obj.pk, field_file.name
+                ))
+                continue
+            content_hash = file_hash(field_file)
+            field_file.close()
+            result[obj.pk] = content_hash
+            if not dry_run:
+                model.objects.filter(pk=obj.pk).update(
+                    content_hash=content_hash
+                )
+        return result
+
+    def _duplicates(self, model, field_name, hashes):
+        """The primary key and file name of the rows with the same content.
+
+        ``hashes`` are the hashes calculated by ``_content_hash`` (which
+        might not be saved).  Returns a list for each hash (``pk`` order).
+
+        """
+        result = {}
+        qs = model.objects.order_by('pk').values_list(
+            'pk', 'content_hash', field_name
+        )
+        for pk, content_hash, name in qs:
+            content_hash = hashes.get(pk, content_hash)
+            if content_hash:
+                result.setdefault(content_hash, []).append((pk, name))
+        return [x for x in result.values() if len(x) > 1]
+
+    def _dedupe(self, model, field_name, hashes, dry_run, delete_files):
+        """Use the file from the first row (for each content hash)."""
+        storage = model._meta.get_field(field_name).storage
+        rows = unused = 0
+        for duplicates in self._duplicates(model, field_name, hashes):
+            keep_pk, name = duplicates[0]
+            replace = [pk for pk, x in duplicates if x != name]
+            names = set([x for pk, x in duplicates if x != name])
+            rows = rows + len(replace)
+            if dry_run:
+                unused = unused + len(names)
+                continue
+            # only change the file (not the 'original_file_name')
+            values = {field_name: name}
+            if model is Image:
+                keep = model.objects.get(pk=keep_pk)
+                values.update(dict(
+                    thumbnails=keep.thumbnails,
+                    thumbnails_hash=keep.thumbnails_hash,
+                ))
+            model.objects.filter(pk__in=replace).update(**values)
+            for old_name in names:
+                in_use = model.objects.filter(**{field_name: old_name})
+                if in_use.exists():
+                    continue
+                unused = unused + 1
+                if delete_files and storage.exists(old_name):
+                    storage.delete(old_name)
+        return rows, unused
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        delete_files = options['delete_files'] and not dry_run
+        for model, field_name in ((Image, 'image'), (Document, 'document')):
+            hashes = self._content_hash(model, field_name, dry_run)
+            rows, unused = self._dedupe(
+                model, field_name, hashes, dry_run, delete_files
+            )
+            self.stdout.write(
+                '{}: calculated {} hashes, {} duplicate rows, '
+                '{} unused files{}'.format(
+                    model._meta.verbose_name_plural,
+                    len(hashes),
+                    rows,
+                    unused,
+                    ' (deleted)' if delete_files else '',
+                )
+            )
+        if dry_run:
+            self.stdout.write('Dry run: nothing was changed')
@@ -0,0 +1,310 @@
+# -*- encoding: utf-8 -*-
+"""Import a directory (or zip file) of images into the image library.
+
+By default, the first folder in the path is the category, and the other
+folders are tags e.g. ``Sport/cricket/bat.jpg`` is in the *Sport*
+category, tagged *cricket*.
+
+A manifest (CSV file) can set the ``title``, ``category`` and ``tags`` for
+each ``path`` e.g::
+
+  path,title,category,tags
+  Sport/cricket/bat.jpg,Cricket bat,Equipment,"cricket, wood"
+
+Images are matched using the content hash, so running the import again
+will skip the images which have already been imported.
+
+"""
+import csv
+import hashlib
+import os
+import time
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import get_available_image_extensions
+from django.db import transaction
+from taggit.models import Tag, TaggedItem
+from taggit.utils import parse_tags
+
+from block.models import Image, ImageCategory
+from block.tasks import rebuild_thumbnails
+from block.upload import upload_max_size
+
+
+def _read_hash(fp):
+    result = hashlib.sha256()
+    for chunk in iter(lambda: fp.read(64 * 1024), b''):
+        result.update(chunk)
+    return result.hexdigest()
+
+
+def _hidden(path):
+    """e.g. ``.DS_Store`` or the ``__MACOSX`` folder in a zip file."""
+    return any([
+        x.startswith('.') or x == '__MACOSX' for x in path.split('/')
+    ])
+
+
+def _title(path):
+    name, extension = os.path.splitext(os.path.basename(path))
+    return name.replace('_', ' ').replace('-', ' ').strip()[:200]
+
+
+class Source:
+    """The image files in a directory or zip file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.zip_file = None
+        if os.path.isfile(path):
+            try:
+                self.zip_file = zipfile.ZipFile(path)
+            except zipfile.BadZipFile:
+                raise CommandError("'{}' is not a zip file".format(path))
+        elif not os.path.isdir(path):
+            raise CommandError("'{}' does not exist".format(path))
+
+    def close(self):
+        if self.zip_file:
+            self.zip_file.close()
+
+    def names(self):
+        """The (relative) path of each image, sorted."""
+        extensions = get_available_image_extensions()
+        if self.zip_file:
+            names = [
+                x.filename for x in self.zip_file.infolist()
+                if not x.filename.endswith('/')
+            ]
+        else:
+            names = []
+            for root, dirs, files in os.walk(self.path):
+                for file_name in files:
+                    names.append(os.path.relpath(
+                        os.path.join(root, file_name), self.path
+                    ).replace(os.sep, '/'))
+        return sorted([
+            x for x in names
+            if os.path.splitext(x)[1][1:].lower() in extensions
+            and not _hidden(x)
+        ])
+
+    def open(self, name):
+        if self.zip_file:
+            return self.zip_file.open(name)
+        return open(os.path.join(self.path, name), 'rb')
+
+    def size(self, name):
+        if self.zip_file:
+            return self.zip_file.getinfo(name).file_size
+        return os.path.getsize(os.path.join(self.path, name))
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Import a directory (or zip file) of images into the image library"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory or zip file')
+        parser.add_argument(
+            '--manifest',
+            help="CSV file with 'path', 'title', 'category' and 'tags'",
+        )
+        parser.add_argument(
+            '--category',
+            help='Category for images which are not in a folder',
+        )
+        parser.add_argument(
+            '--user',
+            help='User name for the uploaded images',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processes for the thumbnails (0 to use this process)',
+        )
+        parser.add_argument(
+            '--no-thumbnails',
+            action='store_true',
+            help="Don't create the thumbnails",
+        )
+
+    def _category(self, name):
+        if not name:
+            return None
+        if name not in self.categories:
+            category = ImageCategory.objects.filter(name=name).first()
+            if not category:
+                category = ImageCategory.objects.create(name=name)
+            self.categories[name] = category
+        return self.categories[name]
+
+    def _details(self, name):
+        """The title, category and tags for the image."""
+        folders = name.split('/')[:-1]
+        category = folders[0] if folders else self.default_category
+        details = {
+            'title': _title(name),
+            'category': category,
+            'tags': folders[1:],
+        }
+        row = self.manifest.get(name)
+        if row:
+            if row.get('title'):
+                details['title'] = row['title'][:200]
+            if row.get('category'):
+                details['category'] = row['category']
+            if row.get('tags'):
+                details['tags'] = parse_tags(row['tags'])
+        return details
+
+    def _manifest(self, file_name):
+        if not file_name:
+            return {}
+        with open(file_name, newline='') as f:
+            rows = list(csv.DictReader(f))
+        if rows and 'path' not in rows[0]:
+            raise CommandError("The manifest needs a 'path' column")
+        return {row['path']: row for row in rows}
+
+    def _tag(self, images, tags):
+        """Tag the images (``tags`` is a dict of content hash and names)."""
+        names = set([name for x in tags.values() for name in x])
+        existing = {x.name: x for x in Tag.objects.filter(name__in=names)}
+        for name in names - set(existing):
+            existing[name] = Tag.objects.create(name=name)
+        content_type = ContentType.objects.get_for_model(Image)
+        TaggedItem.objects.bulk_create([
+            TaggedItem(
+                content_type=content_type,
+                object_id=image.pk,
+                tag=existing[name],
+            )
+            for image in images
+            for name in sorted(set(tags[image.content_hash]))
+        ])
+
+    def _import_batch(self, source, names):
+        """Save the files and insert the rows for one batch of images.
+
+        Returns the number of images imported.
+
+        """
+        hashes = {}
+        for name in names:
+            with source.open(name) as fp:
+                content_hash = _read_hash(fp)
+            if content_hash not in hashes.values():
+                hashes[name] = content_hash
+        exists = set(Image.objects.filter(
+            content_hash__in=list(hashes.values())
+        ).values_list('content_hash', flat=True))
+        field = Image._meta.get_field('image')
+        images = []
+        tags = {}
+        for name, content_hash in hashes.items():
+            if content_hash in exists:
+                continue
+            details = self._details(name)
+            with source.open(name) as fp:
+                file_name = field.storage.save(
+                    field.generate_filename(None, os.path.basename(name)),
+                    File(fp),
+                )
+            images.append(Image(
+                category=self._category(details['category']),
+                content_hash=content_hash,
+                image=file_name,
+                original_file_name=os.path.basename(name)[:100],
+                title=details['title'],
+                user=self.user,
+            ))
+            tags[content_hash] = details['tags']
+        file_names = [x.image.name for x in images]
+        try:
+            with transaction.atomic():
+                Image.objects.bulk_create(images)
+                # ``bulk_create`` doesn't set the primary key (on sqlite)
+                images = Image.objects.filter(
+                    content_hash__in=list(tags)
+                ).order_by('pk')
+                self._tag(images, tags)
+        except Exception:
+            for file_name in file_names:
+                field.storage.delete(file_name)
+            raise
+        return len(tags)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("'--batch-size' must be greater than 0")
+        self.categories = {}
+        self.default_category = options['category']
+        self.manifest = self._manifest(options['manifest'])
+        self.user = None
+        if options['user']:
+            try:
+                self.user = get_user_model().objects.get(
+                    username=options['user']
+                )
+            except get_user_model().DoesNotExist:
+                raise CommandError("User '{}' does not exist".format(
+                    options['user']
+                ))
+        source = Source(options['source'])
+        start = time.time()
+        first_pk = None
+        imported = skipped = 0
+        try:
+            names = []
+            for name in source.names():
+                if source.size(name) > upload_max_size():
+                    self.stderr.write('Skipping {} (too large)'.format(name))
+                else:
+                    names.append(name)
+            batch_size = options['batch_size']
+            for index in range(0, len(names), batch_size):
+                batch = names[index:index + batch_size]
+                if first_pk is None:
+                    latest = Image.objects.order_by('-pk').first()
+                    first_pk = latest.pk + 1 if latest else 1
+                count = self._import_batch(source, batch)
+                imported = imported + count
+                skipped = skipped + len(batch) - count
+                seconds = time.time() - start
+                self.stdout.write(
+                    '{} of {} files, imported {}, skipped {} '
+                    '({:.1f} per second)'.format(
+                        index + len(batch),
+                        len(names),
+                        imported,
+                        skipped,
+                        (index + len(batch)) / seconds if seconds else 0,
+                    )
+                )
+        finally:
+            source.close()
+        if imported and not options['no_thumbnails']:
+            progress = rebuild_thumbnails(
+                queryset=Image.objects.filter(pk__gte=first_pk),
+                workers=options['workers'],
+                batch_size=batch_size,
+            )
+            for pk, error in progress.errors:
+                self.stderr.write('Image {}: {}'.format(pk, error))
+            self.stdout.write(
+                'Created thumbnails for {} images ({:.1f} per second)'.format(
+                    progress.count, progress.per_second
+                )
+            )
+        self.stdout.write('Imported {} images, skipped {}'.format(
+            imported, skipped
+        ))
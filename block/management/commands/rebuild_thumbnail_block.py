@@ -0,0 +1,88 @@
+# -*- encoding: utf-8 -*-
+from django.core.management.base import BaseCommand, CommandError
+
+from block.models import Image, ImageCategory
+from block.tasks import rebuild_thumbnails
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Create the thumbnails for the image library (e.g. after changing "
+        "'THUMBNAIL_ALIASES').  Images with current thumbnails are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of processes (defaults to the number of CPUs)',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--start-pk',
+            type=int,
+            default=None,
+            help='Resume from this image (primary key)',
+        )
+        parser.add_argument(
+            '--category',
+            help='Only images in this category (slug)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild thumbnails which are already current',
+        )
+
+    def _progress(self, progress):
+        self.stdout.write(
+            '{} of {} images ({:.1f} per second) last pk {}'.format(
+                progress.count + progress.skipped,
+                progress.total,
+                progress.per_second,
+                progress.last_pk,
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("'--batch-size' must be greater than 0")
+        queryset = Image.objects.filter(deleted=False)
+        if options['category']:
+            try:
+                category = ImageCategory.objects.get(
+                    slug=options['category']
+                )
+            except ImageCategory.DoesNotExist:
+                raise CommandError("Image category '{}' does not exist".format(
+                    options['category']
+                ))
+            queryset = queryset.filter(category=category)
+        try:
+            progress = rebuild_thumbnails(
+                queryset=queryset,
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                start_pk=options['start_pk'],
+                force=options['force'],
+                callback=self._progress,
+            )
+        except KeyboardInterrupt:
+            raise CommandError(
+                "Interrupted.  To resume, use the last pk (plus one) "
+                "for '--start-pk'"
+            )
+        for pk, error in progress.errors:
+            self.stderr.write('Image {}: {}'.format(pk, error))
+        self.stdout.write(
+            'Created thumbnails for {} images in {:.1f} seconds '
+            '({:.1f} per second), skipped {}, errors {}'.format(
+                progress.count,
+                progress.seconds,
+                progress.per_second,
+                progress.skipped,
+                len(progress.errors),
+            )
+        )
@@ -0,0 +1,180 @@
+# -*- encoding: utf-8 -*-
+"""Per-request metrics for the block views.
+
+``MetricsMixin`` records the number of queries (and the time spent in the
+database), the time to build each ``<slug>_list``, the template render time
+and page / section cache hits and misses.  When the metrics are recorded,
+the query for each section runs in the view (rather than in the template),
+so the time for the section includes the query.
+
+The metrics are only recorded when something is listening:
+
+- connect a receiver to the ``request_metrics`` signal.
+- set ``BLOCK_METRICS_CALLBACK`` to the dotted path of a function e.g.
+  ``def log_metrics(request, metrics):``.
+- set ``BLOCK_SERVER_TIMING = True`` to add a ``Server-Timing`` header to
+  the response (displayed by the browser developer tools).
+
+"""
+import time
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+
+request_metrics = Signal(providing_args=['request', 'metrics'])
+
+
+def _callback():
+    path = getattr(settings, 'BLOCK_METRICS_CALLBACK', None)
+    if path:
+        return import_string(path)
+    return None
+
+
+def _server_timing():
+    return getattr(settings, 'BLOCK_SERVER_TIMING', False)
+
+
+def metrics_enabled():
+    return bool(
+        _server_timing() or _callback() or request_metrics.has_listeners()
+    )
+
+
+class RequestMetrics:
+    """Metrics for one request (the methods do nothing if not enabled)."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.cache = {}
+        self.query_count = 0
+        self.query_ms = 0.0
+        self.render_ms = 0.0
+        self.timings = {}
+        self.total_ms = 0.0
+        self._force_debug_cursor = None
+        self._query_start = 0
+        self._render_start = None
+        self._start = None
+
+    def cache_hit(self, name):
+        if self.enabled:
+            self.cache[name] = True
+
+    def cache_miss(self, name):
+        if self.enabled:
+            self.cache[name] = False
+
+    def _add(self, name, ms):
+        self.timings[name] = self.timings.get(name, 0.0) + ms
+
+    def section(self, slug):
+        """Time spent building the ``<slug>_list`` for a section."""
+        return self.timer('section-{}'.format(slug))
+
+    @contextmanager
+    def sections(self, slugs):
+        """Time spent on a query which is shared by several sections.
+
+        The time is divided between the sections.
+
+        """
+        if not self.enabled or not slugs:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            ms = (time.time() - start) * 1000
+            for slug in slugs:
+                self._add('section-{}'.format(slug), ms / len(slugs))
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._add(name, (time.time() - start) * 1000)
+
+    def server_timing(self):
+        """Value for the ``Server-Timing`` header."""
+        result = [
+            'db;dur={:.1f};desc="{} queries"'.format(
+                self.query_ms, self.query_count
+            ),
+            'render;dur={:.1f}'.format(self.render_ms),
+            'total;dur={:.1f}'.format(self.total_ms),
+        ]
+        for name, ms in sorted(self.timings.items()):
+            result.append('{};dur={:.1f}'.format(name, ms))
+        for name, hit in sorted(self.cache.items()):
+            result.append('cache-{};desc="{}"'.format(
+                name, 'hit' if hit else 'miss'
+            ))
+        return ', '.join(result)
+
+    def start(self):
+        """Start counting queries (we use the debug cursor)."""
+        self._start = time.time()
+        self._force_debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        self._query_start = len(connection.queries_log)
+
+    def start_render(self):
+        self._render_start = time.time()
+
+    def stop(self):
+        now = time.time()
+        if self._render_start:
+            self.render_ms = (now - self._render_start) * 1000
+        self.total_ms = (now - self._start) * 1000
+        queries = list(connection.queries_log)[self._query_start:]
+        self.query_count = len(queries)
+        self.query_ms = sum([float(x['time']) for x in queries]) * 1000
+        connection.force_debug_cursor = self._force_debug_cursor
+
+
+class MetricsMixin:
+    """Record ``RequestMetrics`` for the view (see ``block/metrics.py``)."""
+
+    metrics = RequestMetrics(enabled=False)
+
+    def _metrics_finish(self, request, response):
+        self.metrics.stop()
+        if _server_timing():
+            response['Server-Timing'] = self.metrics.server_timing()
+        callback = _callback()
+        if callback:
+            callback(request, self.metrics)
+        request_metrics.send(
+            sender=self.__class__, request=request, metrics=self.metrics
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not metrics_enabled():
+            return super().dispatch(request, *args, **kwargs)
+        self.metrics = RequestMetrics()
+        self.metrics.start()
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        except Exception:
+            self.metrics.stop()
+            raise
+        if hasattr(response, 'add_post_render_callback'):
+            self.metrics.start_render()
+            response.add_post_render_callback(
+                lambda r: self._metrics_finish(request, r)
+            )
+        else:
+            self._metrics_finish(request, response)
+        return response
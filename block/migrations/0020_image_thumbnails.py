@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('block', '0018_image_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='thumbnails',
+            field=models.TextField(blank=True, help_text='Thumbnail URLs (JSON) set by the thumbnail_image task'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('block', '0020_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='thumbnails_hash',
+            field=models.CharField(blank=True, help_text='Thumbnail options used to create the thumbnails', max_length=32),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('block', '0022_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paginatedsection',
+            name='approximate_count',
+            field=models.BooleanField(default=False, help_text='Count the items (keyset mode, the count is cached)'),
+        ),
+        migrations.AddField(
+            model_name='paginatedsection',
+            name='mode',
+            field=models.CharField(choices=[('offset', 'Page number'), ('keyset', 'Next and previous (for long sections)')], default='offset', max_length=10),
+        ),
+    ]
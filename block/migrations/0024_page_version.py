@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('block', '0023_paginatedsection_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='pagesection',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
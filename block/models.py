@@ -1,15 +1,21 @@
 # -*- encoding: utf-8 -*-
+import hashlib
+import json
 import os
+from collections import namedtuple
 from reversion import revisions as reversion
 
+from django.apps import apps
 from django.conf import settings
-from django.contrib.admin.utils import NestedObjects
 from django.contrib.contenttypes.models import ContentType
 
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.urlresolvers import reverse
+from django.core.signals import setting_changed
+from django.core.urlresolvers import get_script_prefix, get_urlconf, reverse
 from django.db import models, transaction
-from django.db.models import Count, Max
+from django.db.models import Case, CharField, Count, F, Max, Value, When
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
 from django.utils import timezone
 
 from django_extensions.db.fields import AutoSlugField
@@ -22,6 +28,30 @@ from base.model_utils import (
     TimedCreateModifyDeleteModel,
 )
 from base.singleton import SingletonModel
+from block.cache import (
+    invalidate_on_commit,
+    invalidate_page,
+    invalidate_section,
+    invalidate_site,
+    menu_cache_get,
+    menu_cache_key,
+    menu_cache_set,
+    menu_cache_timeout,
+)
+
+
+def _copy_instance(obj):
+    """Copy a model instance (without the primary key).
+
+    The foreign keys are copied using ``attname`` (the ``*_id`` values), so
+    the related rows are not fetched from the database.
+
+    """
+    return obj.__class__(**{
+        f.attname: getattr(obj, f.attname)
+        for f in obj._meta.concrete_fields
+        if not f.primary_key
+    })
 
 
 def _default_edit_state():
@@ -84,19 +114,51 @@ class BlockError(Exception):
         return repr('%s, %s' % (self.__class__.__name__, self.value))
 
 
-class EditStateManager(models.Manager):
+# process-local cache of the state lookup rows (see ``StateManager``)
+_state_cache = {}
+
+
+class StateManager(models.Manager):
+    """Cache the rows of a (tiny) state lookup table, keyed by slug.
+
+    The rows are loaded once per process, the first time a state is needed.
+    The cache is cleared when a state row is saved or deleted (and after a
+    database flush), so the next request re-loads the table.
+
+    """
+
+    def _state(self, slug):
+        label = self.model._meta.label
+        states = _state_cache.get(label)
+        if states is None or slug not in states:
+            states = {obj.slug: obj for obj in self.model.objects.all()}
+            _state_cache[label] = states
+        try:
+            return states[slug]
+        except KeyError:
+            raise self.model.DoesNotExist(
+                "{} matching slug '{}' does not exist".format(
+                    self.model.__name__, slug
+                )
+            )
+
+    def clear_cache(self):
+        _state_cache.pop(self.model._meta.label, None)
+
+
+class EditStateManager(StateManager):
 
     def _add(self):
         """Internal use only."""
-        return EditState.objects.get(slug=EditState.ADD)
+        return self._state(EditState.ADD)
 
     def _edit(self):
         """Internal use only."""
-        return EditState.objects.get(slug=EditState.EDIT)
+        return self._state(EditState.EDIT)
 
     def _push(self):
         """Internal use only."""
-        return EditState.objects.get(slug=EditState.PUSH)
+        return self._state(EditState.PUSH)
 
     def create_edit_state(self, slug, name):
         obj = self.model(slug=slug, name=name)
@@ -127,19 +189,26 @@ class EditState(models.Model):
 reversion.register(EditState)
 
 
-class ModerateStateManager(models.Manager):
+class ModerateStateManager(StateManager):
+
+    def _code(self, pk):
+        """The code for a state (see ``ModerateCodeMixin``)."""
+        for slug, code in self.model.CODES.items():
+            if self._state(slug).pk == pk:
+                return code
+        return self.model.CODES[self.model.objects.get(pk=pk).slug]
 
     def _published(self):
         """Internal use only."""
-        return self.model.objects.get(slug=ModerateState.PUBLISHED)
+        return self._state(ModerateState.PUBLISHED)
 
     def _pending(self):
         """Internal use only."""
-        return self.model.objects.get(slug=ModerateState.PENDING)
+        return self._state(ModerateState.PENDING)
 
     def _removed(self):
         """Internal use only."""
-        return self.model.objects.get(slug=ModerateState.REMOVED)
+        return self._state(ModerateState.REMOVED)
 
     def create_moderate_state(self, slug, name):
         obj = self.model(slug=slug, name=name)
@@ -154,6 +223,13 @@ class ModerateState(models.Model):
     PUBLISHED = 'published'
     REMOVED = 'removed'
 
+    # compact codes for the states (see ``ModerateCodeMixin``)
+    CODES = {
+        PENDING: 1,
+        PUBLISHED: 2,
+        REMOVED: 3,
+    }
+
     name = models.CharField(max_length=100)
     slug = models.SlugField(max_length=100)
     objects = ModerateStateManager()
@@ -170,6 +246,54 @@ class ModerateState(models.Model):
 reversion.register(ModerateState)
 
 
+@receiver(post_save, sender=EditState)
+@receiver(post_delete, sender=EditState)
+@receiver(post_save, sender=ModerateState)
+@receiver(post_delete, sender=ModerateState)
+def _state_changed(sender, **kwargs):
+    sender.objects.clear_cache()
+
+
+@receiver(post_migrate)
+def _state_flushed(sender, **kwargs):
+    """'flush' (and the test runner) re-create the rows with new keys."""
+    _state_cache.clear()
+
+
+# process-local cache of resolved URLs (see ``_reverse``)
+_url_cache = {}
+URL_CACHE_SIZE = 10000
+
+
+def _reverse(name, args=None, kwargs=None):
+    """``reverse``, remembering the result.
+
+    The result only depends on the arguments (and the URLconf), so when a
+    ``Url`` or ``Page`` changes, we just look up a different key.
+
+    """
+    key = (
+        get_urlconf(),
+        get_script_prefix(),
+        name,
+        tuple(args or ()),
+        tuple(sorted((kwargs or {}).items())),
+    )
+    result = _url_cache.get(key)
+    if result is None:
+        if len(_url_cache) >= URL_CACHE_SIZE:
+            _url_cache.clear()
+        result = reverse(name, args=args, kwargs=kwargs)
+        _url_cache[key] = result
+    return result
+
+
+@receiver(setting_changed)
+def _url_setting_changed(setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        _url_cache.clear()
+
+
 class TemplateManager(models.Manager):
     """Move to ``block``?"""
 
@@ -225,8 +349,36 @@ class Template(TimeStampedModel):
 reversion.register(Template)
 
 
+class ContentVersionModel(models.Model):
+    """Abstract base class for a model with a content ``version``.
+
+    The version is incremented in the database (using ``F``), so ``save``
+    doesn't write it (a stale instance would move the version backwards).
+
+    """
+
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update = not (self._state.adding or kwargs.get('force_insert'))
+        if update and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                f.attname for f in self._meta.concrete_fields
+                if not f.primary_key and
+                f.attname not in deferred and
+                f.name != 'version'
+            ]
+        super().save(*args, **kwargs)
+
+
 class PageManager(models.Manager):
 
+    BATCH_SIZE = 250
+
     def create_page(
             self, slug_page, slug_menu, name, order, template, **kwargs):
         obj = self.model(
@@ -292,12 +444,102 @@ class PageManager(models.Manager):
             is_custom=True,
         )
 
-    def refresh_sections_from_template(self, template):
-        for p in self.model.objects.filter(template=template):
-            p.refresh_sections_from_template()
+    def bump_version(self, page_pks):
+        """The content of the pages has changed."""
+        page_pks = sorted(set(page_pks))
+        for start in range(0, len(page_pks), self.BATCH_SIZE):
+            self.model.objects.filter(
+                pk__in=page_pks[start:start + self.BATCH_SIZE]
+            ).update(version=F('version') + 1)
+
+    def refresh_sections(self, pages):
+        """Update page sections by comparing to the template sections.
+
+        ``pages`` is a queryset.  The difference is calculated for all of
+        the pages at once, then the page sections are deleted and created in
+        bulk.
+
+        """
+        qs = pages
+        pages = {
+            x.pk: x for x in qs.only('pk', 'slug', 'slug_menu', 'template')
+        }
+        template_sections = {}
+        for template_pk, section_pk in TemplateSection.objects.filter(
+                template__in=qs.values('template')
+        ).values_list('template', 'section'):
+            template_sections.setdefault(template_pk, set()).add(section_pk)
+        existing = {}
+        to_delete = []
+        for pk, page_pk, section_pk in PageSection.objects.filter(
+                page__in=qs.values('pk')
+        ).values_list('pk', 'page', 'section'):
+            existing.setdefault(page_pk, set()).add(section_pk)
+            sections = template_sections.get(pages[page_pk].template_id, ())
+            if section_pk not in sections:
+                to_delete.append((pk, page_pk))
+        to_create = [
+            PageSection(page_id=page.pk, section_id=section_pk)
+            for page in pages.values()
+            for section_pk in sorted(
+                template_sections.get(page.template_id, set()) -
+                existing.get(page.pk, set())
+            )
+        ]
+        with transaction.atomic():
+            # if the section is not used on the page, then delete it.
+            for start in range(0, len(to_delete), self.BATCH_SIZE):
+                batch = to_delete[start:start + self.BATCH_SIZE]
+                PageSection.objects.filter(
+                    pk__in=[pk for pk, page_pk in batch]
+                ).delete()
+            # if the section is not on the page, then add it.
+            PageSection.objects.bulk_create(
+                to_create, batch_size=self.BATCH_SIZE
+            )
+        changed = set([page_pk for pk, page_pk in to_delete])
+        changed.update([x.page_id for x in to_create])
+        self.bump_version(changed)
+        for page_pk in changed:
+            invalidate_on_commit(
+                lambda page=pages[page_pk]: invalidate_page(page)
+            )
 
+    def refresh_sections_from_template(self, template, background=None):
+        """Update the page sections for all the pages using the template.
 
-class Page(TimeStampedModel):
+        If ``background`` is ``None``, then the sections for a template used
+        by more than ``BLOCK_REFRESH_SECTIONS_BACKGROUND`` pages are updated
+        by a Celery task (after the transaction commits).
+
+        """
+        pages = self.model.objects.filter(template=template)
+        if background is None:
+            background = pages.count() > getattr(
+                settings, 'BLOCK_REFRESH_SECTIONS_BACKGROUND', 500
+            )
+        if background:
+            # avoid a circular import
+            from block.tasks import refresh_sections_from_template
+            transaction.on_commit(
+                lambda: refresh_sections_from_template.delay(template.pk)
+            )
+        else:
+            self.refresh_sections(pages)
+
+    def version(self, slug, slug_menu=''):
+        """The content version of the page (or ``None``).
+
+        One row from one table, so a cache can check if anything on the
+        page has changed.
+
+        """
+        return self.model.objects.filter(
+            slug=slug, slug_menu=slug_menu
+        ).values_list('version', flat=True).first()
+
+
+class Page(ContentVersionModel, TimeStampedModel):
     """A page on the web site.
 
     slug_menu
@@ -365,12 +607,12 @@ class Page(TimeStampedModel):
     def get_absolute_url(self):
         name = self.url_name
         if self.is_home:
-            return reverse(name)
+            return _reverse(name)
         else:
-            return reverse(name, kwargs=self.get_url_kwargs())
+            return _reverse(name, kwargs=self.get_url_kwargs())
 
     def get_design_url(self):
-        return reverse('project.page.design', kwargs=self.get_url_kwargs())
+        return _reverse('project.page.design', kwargs=self.get_url_kwargs())
 
     def get_url_kwargs(self):
         result = dict(page=self.slug,)
@@ -380,34 +622,13 @@ class Page(TimeStampedModel):
 
     def refresh_sections_from_template(self):
         """Update page sections by comparing to the template sections."""
-        # iterate through existing sections in the page
-        section_slugs = [s.section.slug for s in self.pagesection_set.all()]
-        for slug in section_slugs:
-            try:
-                # if the section is still used on the page, then keep it.
-                template_section = self.template.templatesection_set.get(
-                    section__slug=slug
-                )
-            except TemplateSection.DoesNotExist:
-                # pass
-                # PJK 30/10/2015
-                # Am I too scared to leave this in!!
-                # if the section is not used on the page, then delete it.
-                PageSection.objects.get(page=self, section__slug=slug).delete()
-        # iterate through the new sections
-        for template_section in self.template.templatesection_set.all():
-            try:
-                # if the section exists on the page, then keep it.
-                PageSection.objects.get(
-                    page=self, section=template_section.section
-                )
-            except PageSection.DoesNotExist:
-                # if the section is not on the page, then add it.
-                page_section = PageSection(
-                    page=self,
-                    section=template_section.section,
-                )
-                page_section.save()
+        Page.objects.refresh_sections(Page.objects.filter(pk=self.pk))
+
+    def publish(self, user):
+        """Publish all of the changes on this page."""
+        publish_sections(
+            self.pagesection_set.select_related('section'), user
+        )
 
     def set_deleted(self):
         self.deleted = True
@@ -427,34 +648,66 @@ reversion.register(Page)
 
 class PaginatedSectionManager(models.Manager):
 
-    def create_paginated_section(self, items_per_page, order_by_field):
+    def create_paginated_section(
+            self, items_per_page, order_by_field, **kwargs):
         obj = self.model(
             items_per_page=items_per_page,
             order_by_field=order_by_field,
+            mode=kwargs.get('mode', self.model.OFFSET),
+            approximate_count=kwargs.get('approximate_count', False),
         )
         obj.save()
         return obj
 
-    def init_paginated_section(self, items_per_page, order_by_field):
+    def init_paginated_section(
+            self, items_per_page, order_by_field, **kwargs):
         try:
             obj = PaginatedSection.objects.get(order_by_field=order_by_field)
             obj.items_per_page = items_per_page
+            obj.mode = kwargs.get('mode', self.model.OFFSET)
+            obj.approximate_count = kwargs.get('approximate_count', False)
             obj.save()
         except self.model.DoesNotExist:
-            obj = self.create_paginated_section(items_per_page, order_by_field)
+            obj = self.create_paginated_section(
+                items_per_page, order_by_field, **kwargs
+            )
         return obj
 
 
 class PaginatedSection(models.Model):
-    """Parameters for a Paginated Section."""
+    """Parameters for a Paginated Section.
+
+    ``KEYSET`` pagination uses a cursor (rather than a page number), so
+    deep pages are as quick as the first (see ``block/pagination.py``).
+
+    """
+
+    OFFSET = 'offset'
+    KEYSET = 'keyset'
+
+    MODE_CHOICES = (
+        (OFFSET, 'Page number'),
+        (KEYSET, 'Next and previous (for long sections)'),
+    )
 
     items_per_page = models.IntegerField(default=10)
     order_by_field = models.CharField(max_length=100)
+    mode = models.CharField(
+        max_length=10, choices=MODE_CHOICES, default=OFFSET
+    )
+    approximate_count = models.BooleanField(
+        default=False,
+        help_text='Count the items (keyset mode, the count is cached)',
+    )
     objects = PaginatedSectionManager()
 
     def __str__(self):
         return '{} - {}'.format(self.items_per_page, self.order_by_field)
 
+    @property
+    def is_keyset(self):
+        return self.mode == self.KEYSET
+
 
 reversion.register(PaginatedSection)
 
@@ -532,6 +785,10 @@ class Section(TimeStampedModel):
     def __str__(self):
         return '{}'.format(self.name)
 
+    def get_block_model(self):
+        """The content model for this section e.g. ``compose.Article``."""
+        return apps.get_model(self.block_app, self.block_model)
+
     def create_url(self, page):
         url = None
         if self.create_url_name:
@@ -551,6 +808,40 @@ class PageSectionManager(models.Manager):
         obj.save()
         return obj
 
+    def bump_version(self, page_section_pks):
+        """The content has changed, so update the page sections and pages.
+
+        The versions are incremented by the database, so two requests
+        changing the same page won't lose an update.
+
+        """
+        page_section_pks = list(set(page_section_pks))
+        if page_section_pks:
+            self._bump_version(
+                self.model.objects.filter(pk__in=page_section_pks)
+            )
+
+    def bump_version_block(self, block_model, block_pk):
+        """The content of a block has changed.
+
+        The page section is selected using a sub-query, so we don't need to
+        fetch the block.
+
+        """
+        self._bump_version(
+            self.model.objects.filter(
+                pk__in=block_model.objects.filter(pk=block_pk).values(
+                    'page_section'
+                )
+            )
+        )
+
+    def _bump_version(self, qs):
+        qs.update(version=F('version') + 1)
+        Page.objects.filter(pk__in=qs.values('page')).update(
+            version=F('version') + 1
+        )
+
     def init_page_section(self, page, section):
         try:
             obj = PageSection.objects.get(page=page, section=section)
@@ -558,8 +849,14 @@ class PageSectionManager(models.Manager):
             obj = self.create_page_section(page, section)
         return obj
 
+    def version(self, page_section_pk):
+        """The content version of the page section (or ``None``)."""
+        return self.model.objects.filter(pk=page_section_pk).values_list(
+            'version', flat=True
+        ).first()
 
-class PageSection(models.Model):
+
+class PageSection(ContentVersionModel):
     """Section of a page."""
 
     page = models.ForeignKey(Page)
@@ -575,6 +872,10 @@ class PageSection(models.Model):
     def __str__(self):
         return '{} {}'.format(self.page.name, self.section.name)
 
+    def publish(self, user):
+        """Publish all of the changes in this section of the page."""
+        publish_sections([self], user)
+
 
 reversion.register(PageSection)
 
@@ -596,6 +897,87 @@ class BlockModel(TimeStampedModel):
             self.page_section.section.name,
         )
 
+    @classmethod
+    def _content_model(cls):
+        """The content model (using the ``content`` related name)."""
+        return cls._meta.get_field('content').related_model
+
+    @classmethod
+    def _content_filter(cls, slug):
+        """Filter the content by moderate state."""
+        return cls._content_model()._moderate_filter(slug)
+
+    @classmethod
+    def _publish_blocks(cls, blocks, user):
+        """Publish pending content for blocks of this type.
+
+        This is the bulk version of ``publish`` (see ``publish_many``).
+
+        """
+        content_model = cls._content_model()
+        block_pks = {block.pk for block in blocks}
+        content = content_model.objects.filter(block__in=block_pks)
+        pending_list = list(
+            content.filter(**cls._content_filter(ModerateState.PENDING))
+        )
+        if len(pending_list) != len(block_pks):
+            raise BlockError(
+                "Cannot publish content unless it is 'pending'"
+            )
+        now = timezone.now()
+        # delete content which was previously removed.
+        content.filter(
+            **cls._content_filter(ModerateState.REMOVED)
+        ).delete()
+        # remove currently published content.
+        content.filter(
+            **cls._content_filter(ModerateState.PUBLISHED)
+        ).update(
+            date_moderated=now,
+            modified=now,
+            user_moderated=user,
+            **content_model._moderate_values(ModerateState.REMOVED)
+        )
+        # copy the pending records to new published records.
+        copies = []
+        for pending in pending_list:
+            published_instance = _copy_instance(pending)
+            published_instance._set_moderated(
+                user, ModerateState.objects._published()
+            )
+            copies.append(published_instance)
+        content_model.objects.bulk_create(copies)
+        # 'bulk_create' doesn't set the primary key (except on PostgreSQL)
+        published_instances = {
+            obj.block_id: obj for obj in content.filter(
+                **cls._content_filter(ModerateState.PUBLISHED)
+            )
+        }
+        content_model.copy_related_data_many([
+            (pending, published_instances[pending.block_id])
+            for pending in pending_list
+        ])
+        # mark the pending records as 'pushed' (published)
+        content_model.objects.filter(
+            pk__in=[pending.pk for pending in pending_list]
+        ).update(
+            edit_state=EditState.objects._push(),
+            modified=now,
+        )
+        page_section_pks = {block.page_section_id for block in blocks}
+        PageSection.objects.bump_version(page_section_pks)
+        for page_section in PageSection.objects.filter(
+                pk__in=page_section_pks
+                ).select_related('page'):
+            invalidate_on_commit(
+                lambda page_section=page_section: invalidate_section(
+                    page_section
+                )
+            )
+            invalidate_on_commit(
+                lambda page=page_section.page: invalidate_page(page)
+            )
+
     def _delete_removed_content(self):
         """delete content which was previously removed."""
         try:
@@ -606,9 +988,17 @@ class BlockModel(TimeStampedModel):
 
     def _get_removed(self):
         return self.content.get(
-            moderate_state=ModerateState.objects._removed()
+            **self._content_filter(ModerateState.REMOVED)
         )
 
+    def _invalidate_cache(self):
+        """The content has changed, so the cached page is out of date."""
+        page_section = self.page_section
+        page = page_section.page
+        PageSection.objects.bump_version([page_section.pk])
+        invalidate_on_commit(lambda: invalidate_section(page_section))
+        invalidate_on_commit(lambda: invalidate_page(page))
+
     def _remove_published_content(self, user):
         """publishing new content, so remove currently published content."""
         try:
@@ -621,13 +1011,13 @@ class BlockModel(TimeStampedModel):
     def get_pending(self):
         """If the block has pending content, then get it."""
         return self.content.get(
-            moderate_state=ModerateState.objects._pending()
+            **self._content_filter(ModerateState.PENDING)
         )
 
     def get_published(self):
         """If the block has published content, then get it."""
         return self.content.get(
-            moderate_state=ModerateState.objects._published()
+            **self._content_filter(ModerateState.PUBLISHED)
         )
 
     def publish(self, user):
@@ -648,10 +1038,12 @@ class BlockModel(TimeStampedModel):
             )
             published_instance.save()
             # give pending class the opportunity to copy data
+            pending.copy_ordered_relations([(pending, published_instance)])
             pending.copy_related_data(published_instance)
             # mark the pending record as 'pushed' (published)
             pending.set_pending_pushed()
             pending.save()
+            self._invalidate_cache()
 
     def remove(self, user):
         """Remove content.
@@ -689,6 +1081,65 @@ class BlockModel(TimeStampedModel):
                     user, ModerateState.objects._removed()
                 )
                 pending.save()
+            self._invalidate_cache()
+
+
+def publish_many(blocks, user):
+    """Publish the pending content for many blocks (in one transaction).
+
+    The blocks can be of different types.  Each type of block is published
+    using a few bulk queries, rather than several queries for each block.
+
+    """
+    block_types = {}
+    for block in blocks:
+        block_types.setdefault(block.__class__, []).append(block)
+    with transaction.atomic():
+        for block_class, items in block_types.items():
+            block_class._publish_blocks(items, user)
+
+
+def publish_sections(page_sections, user):
+    """Publish the content which has been added or edited in page sections.
+
+    Pending content which has already been published (``push``) is ignored.
+
+    """
+    content_models = {}
+    for page_section in page_sections:
+        content_model = page_section.section.get_block_model()
+        content_models.setdefault(content_model, []).append(page_section)
+    blocks = []
+    for content_model, items in content_models.items():
+        qs = content_model.objects.filter(
+            block__page_section__in=items,
+            **content_model._moderate_filter(ModerateState.PENDING)
+        ).exclude(
+            edit_state=EditState.objects._push(),
+        ).select_related(
+            'block',
+        )
+        blocks = blocks + [c.block for c in qs]
+    publish_many(blocks, user)
+
+
+def content_indexes(name, state_field='moderate_state'):
+    """Indexes for the ``ContentManager`` queries on a content model.
+
+    ``pending``, ``published`` and ``next_order`` find the content for the
+    blocks in a page section, filter by state and order by ``order``.
+    ``Meta.indexes`` is not inherited from an abstract model (and the
+    ``name`` must be unique), so add these to each content model::
+
+      class Meta:
+          indexes = content_indexes('compose_article_block_idx')
+
+    Use ``state_field='moderate_code'`` with the ``ModerateCodeMixin``.
+
+    """
+    return [
+        models.Index(fields=['block', state_field, 'order'], name=name),
+    ]
 
 
 class ContentManager(models.Manager):
@@ -697,7 +1148,7 @@ class ContentManager(models.Manager):
         rtn = self.model.objects.filter(
                     block__page_section=block.page_section
                     ).exclude(
-                        moderate_state__slug='removed'
+                        **self.model._moderate_filter(ModerateState.REMOVED)
                         ).aggregate(Max('order'))['order__max']
         if rtn is None:
             rtn = -1
@@ -709,10 +1160,9 @@ class ContentManager(models.Manager):
         Note: we return a list of content instances not a queryset.
 
         """
-        pending = ModerateState.objects._pending()
         qs = self.model.objects.filter(
             block__page_section=page_section,
-            moderate_state=pending,
+            **self.model._moderate_filter(ModerateState.PENDING)
         )
         order_by = None
         if kwargs:
@@ -726,14 +1176,35 @@ class ContentManager(models.Manager):
 
     def published(self, page_section):
         """Return a published content for a page."""
-        published = ModerateState.objects._published()
         return self.model.objects.filter(
             block__page_section=page_section,
-            moderate_state=published,
+            **self.model._moderate_filter(ModerateState.PUBLISHED)
+        ).order_by(
+            'order',
+        )
+
+    def _sections(self, page_sections, slug):
+        return self.model.objects.filter(
+            block__page_section__in=page_sections,
+            **self.model._moderate_filter(slug)
+        ).select_related(
+            'block',
         ).order_by(
             'order',
         )
 
+    def pending_sections(self, page_sections):
+        """Pending content for several page sections (in one query).
+
+        Group the content using ``block.page_section_id``.
+
+        """
+        return self._sections(page_sections, ModerateState.PENDING)
+
+    def published_sections(self, page_sections):
+        """Published content for several page sections (in one query)."""
+        return self._sections(page_sections, ModerateState.PUBLISHED)
+
 
 class ContentModel(TimeStampedModel):
     """Abstract base class for the content within blocks.
@@ -758,6 +1229,10 @@ class ContentModel(TimeStampedModel):
     )
     objects = ContentManager()
 
+    # many to many fields (with an ordered 'through' model) which are copied
+    # when the content is published e.g. ``('slideshow', 'references')``
+    ordered_relations = ()
+
     class Meta:
         abstract = True
         verbose_name = 'Block content'
@@ -766,51 +1241,135 @@ class ContentModel(TimeStampedModel):
     def __str__(self):
         return '{}'.format(self.pk)
 
+    def _is_edit_state(self, edit_state):
+        """Compare keys, so we don't fetch the state row for each instance."""
+        return self.edit_state_id == edit_state.pk
+
+    def _is_moderate_state(self, slug):
+        if isinstance(self, ModerateCodeMixin):
+            return self.moderate_code == ModerateState.CODES[slug]
+        return self.moderate_state_id == ModerateState.objects._state(slug).pk
+
+    @classmethod
+    def _moderate_filter(cls, slug):
+        """Filter arguments for content in the moderate state."""
+        if issubclass(cls, ModerateCodeMixin):
+            return {'moderate_code': ModerateState.CODES[slug]}
+        return {'moderate_state': ModerateState.objects._state(slug)}
+
+    @classmethod
+    def _moderate_values(cls, slug):
+        """Update arguments to set the moderate state."""
+        result = {'moderate_state': ModerateState.objects._state(slug)}
+        if issubclass(cls, ModerateCodeMixin):
+            result['moderate_code'] = ModerateState.CODES[slug]
+        return result
+
     def _is_pending(self):
-        return self.moderate_state == ModerateState.objects._pending()
+        return self._is_moderate_state(ModerateState.PENDING)
     is_pending = property(_is_pending)
 
     def _is_pending_added(self):
-        return self.is_pending and self.edit_state == EditState.objects._add()
+        return self.is_pending and self._is_edit_state(
+            EditState.objects._add()
+        )
     is_pending_added = property(_is_pending_added)
 
     def _is_pending_edited(self):
-        return self.is_pending and self.edit_state == EditState.objects._edit()
+        return self.is_pending and self._is_edit_state(
+            EditState.objects._edit()
+        )
     is_pending_edited = property(_is_pending_edited)
 
     def _is_pending_pushed(self):
-        return self.is_pending and self.edit_state == EditState.objects._push()
+        return self.is_pending and self._is_edit_state(
+            EditState.objects._push()
+        )
     is_pending_pushed = property(_is_pending_pushed)
 
     def _is_published(self):
-        return self.moderate_state == ModerateState.objects._published()
+        return self._is_moderate_state(ModerateState.PUBLISHED)
     is_published = property(_is_published)
 
     def _is_removed(self):
-        return self.moderate_state == ModerateState.objects._removed()
+        return self._is_moderate_state(ModerateState.REMOVED)
     is_removed = property(_is_removed)
 
     def _set_moderated(self, user, moderate_state):
         self.date_moderated = timezone.now()
         self.user_moderated = user
         self.moderate_state = moderate_state
+        if isinstance(self, ModerateCodeMixin):
+            self.moderate_code = ModerateState.CODES[moderate_state.slug]
 
     def copy_related_data(self, published_instance):
         """Copy related data from this instance to the published instance.
 
-        If the content type has many to many keys or elements
-        e.g. accordion, then override this method to copy the data from
-        'pending' to 'published'.
+        Many to many fields listed in ``ordered_relations`` are copied for
+        you (see ``copy_ordered_relations``).  If the content type has other
+        related data e.g. accordion elements, then override this method to
+        copy the data from 'pending' to 'published'.
 
         """
         pass
 
+    @classmethod
+    def copy_ordered_relations(cls, instances):
+        """Copy the 'through' rows for the ``ordered_relations``.
+
+        ``instances`` is a list of ``(pending, published)`` tuples.  The rows
+        for each relation are read in one query and inserted in another.
+
+        """
+        published_instances = {
+            pending.pk: published_instance
+            for pending, published_instance in instances
+        }
+        for name in cls.ordered_relations:
+            field = cls._meta.get_field(name)
+            through = field.remote_field.through
+            source = through._meta.get_field(field.m2m_field_name())
+            rows = []
+            qs = through.objects.filter(
+                **{'{}__in'.format(source.name): list(published_instances)}
+            )
+            for row in qs:
+                obj = _copy_instance(row)
+                setattr(
+                    obj,
+                    source.attname,
+                    published_instances[getattr(row, source.attname)].pk
+                )
+                rows.append(obj)
+            through.objects.bulk_create(rows)
+
+    @classmethod
+    def copy_related_data_many(cls, instances):
+        """Copy related data for a list of ``(pending, published)`` tuples.
+
+        Used by ``publish_many``.  Override this method if you can copy the
+        data for many instances more efficiently than ``copy_related_data``.
+
+        """
+        cls.copy_ordered_relations(instances)
+        for pending, published_instance in instances:
+            pending.copy_related_data(published_instance)
+
     def has_elements(self):
         """If the content type has elements e.g. accordion, then override this
         method and return 'True'.
         """
         return False
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # changes in design mode (publishing updates the version when the
+        # pending content is 'pushed')
+        if self.is_pending and not self.is_pending_pushed:
+            PageSection.objects.bump_version_block(
+                self._meta.get_field('block').related_model, self.block_id
+            )
+
     def set_pending_edit(self):
         """Content has been edited... so update the state.
 
@@ -819,9 +1378,9 @@ class ContentModel(TimeStampedModel):
 
         """
         if self.is_pending:
-            if self.edit_state == EditState.objects._add():
+            if self._is_edit_state(EditState.objects._add()):
                 pass
-            elif self.edit_state == EditState.objects._push():
+            elif self._is_edit_state(EditState.objects._push()):
                 self.edit_state = EditState.objects._edit()
         else:
             raise BlockError(
@@ -883,6 +1442,148 @@ class ContentModel(TimeStampedModel):
         return result
 
 
+class ModerateCodeMixin(models.Model):
+    """Keep a compact copy of the moderate state on the content row.
+
+    Add this mixin to a content model (before ``ContentModel``), so the
+    content can be filtered (and ``is_pending``, ``is_published`` and
+    ``is_removed`` evaluated) without the ``ModerateState`` lookup table::
+
+      class Title(ModerateCodeMixin, ContentModel):
+
+    Use ``populate_moderate_code`` in a data migration to set the code for
+    existing content.
+
+    """
+
+    moderate_code = models.PositiveSmallIntegerField(
+        db_index=True,
+        default=ModerateState.CODES[ModerateState.PENDING],
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """The ``moderate_state`` might be set directly e.g. in the admin."""
+        if self.moderate_state_id:
+            self.moderate_code = ModerateState.objects._code(
+                self.moderate_state_id
+            )
+        super().save(*args, **kwargs)
+
+
+def populate_moderate_code(app_label, model_name):
+    """Data migration (``RunPython``) to set the ``moderate_code``."""
+    def forwards(apps, schema_editor):
+        model = apps.get_model(app_label, model_name)
+        for slug, code in ModerateState.CODES.items():
+            model.objects.filter(
+                moderate_state__slug=slug
+            ).update(
+                moderate_code=code
+            )
+    return forwards
+
+
+def _usage_relations(model):
+    """The fields on content models which refer to ``model``.
+
+    Returns a list of ``(content_model, field)``.  The fields are foreign
+    keys (e.g. ``Title.link``) and many to many fields (e.g.
+    ``Title.references``, using the ``TitleLink`` through model).
+
+    """
+    result = []
+    for content_model in apps.get_models():
+        if issubclass(content_model, ContentModel):
+            for field in content_model._meta.get_fields():
+                if (field.concrete and field.is_relation and
+                        field.related_model is model):
+                    result.append((content_model, field))
+    return result
+
+
+def _usage(model, pks):
+    """Published and pending content which uses the ``model`` instances.
+
+    Returns a dict of ``{pk: [content, ...]}`` using one query for each
+    relation, and one for each content model (rather than collecting the
+    whole object graph for each instance).
+
+    """
+    used = {}
+    for content_model, field in _usage_relations(model):
+        if field.many_to_many:
+            through = field.remote_field.through
+            target = through._meta.get_field(field.m2m_reverse_field_name())
+            source = through._meta.get_field(field.m2m_field_name())
+            pairs = through.objects.filter(
+                **{'{}__in'.format(target.name): pks}
+            ).values_list(target.attname, source.attname)
+        else:
+            pairs = content_model.objects.filter(
+                **{'{}__in'.format(field.name): pks}
+            ).values_list(field.attname, 'pk')
+        content_pks = used.setdefault(content_model, {})
+        for pk, content_pk in pairs:
+            content_pks.setdefault(content_pk, set()).add(pk)
+    result = {}
+    for content_model, content_pks in used.items():
+        if not content_pks:
+            continue
+        qs = content_model.objects.filter(
+            pk__in=list(content_pks),
+        ).exclude(
+            **content_model._moderate_filter(ModerateState.REMOVED)
+        ).select_related(
+            'block__page_section__page',
+        ).order_by(
+            'pk',
+        )
+        for content in qs:
+            for pk in content_pks[content.pk]:
+                result.setdefault(pk, []).append(content)
+    return result
+
+
+def _pages_used(content_list):
+    """The pages (sorted by name) for a list of content."""
+    pages = {}
+    for content in content_list:
+        page = content.block.page_section.page
+        pages[page.pk] = page
+    return sorted(pages.values(), key=lambda page: page.name)
+
+
+def file_hash(field_file):
+    """The SHA-256 hash of the file content.
+
+    ``ContentUploadHandler`` calculates the hash while the file is uploaded,
+    so we only read the file if the hash isn't available.
+
+    """
+    content_hash = getattr(field_file.file, 'content_hash', None)
+    if not content_hash:
+        result = hashlib.sha256()
+        for chunk in field_file.chunks():
+            result.update(chunk)
+        content_hash = result.hexdigest()
+    return content_hash
+
+
+def existing_file(model, field_name, content_hash, pk=None):
+    """A row with the same file content (if the file is still in storage)."""
+    qs = model.objects.filter(content_hash=content_hash).order_by('pk')
+    if pk:
+        qs = qs.exclude(pk=pk)
+    for obj in qs[:1]:
+        field_file = getattr(obj, field_name)
+        if field_file and field_file.storage.exists(field_file.name):
+            return obj
+    return None
+
+
 class Document(models.Model):
 
     title = models.CharField(max_length=200)
@@ -899,6 +1600,12 @@ class Document(models.Model):
         help_text='Original file name of the document'
     )
     deleted = models.BooleanField(default=False)
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text='SHA-256 hash of the document (see ``file_hash``)',
+    )
 
     def __str__(self):
         return '{}'.format(self.title)
@@ -909,7 +1616,18 @@ class Document(models.Model):
         verbose_name_plural = 'Documents'
 
     def save(self, *args, **kwargs):
-        """Save the original file name."""
+        """Save the original file name.
+
+        If the document has been uploaded before, then use the same file.
+
+        """
+        if self.document and not self.document._committed:
+            self.content_hash = file_hash(self.document)
+            existing = existing_file(
+                Document, 'document', self.content_hash, self.pk
+            )
+            if existing:
+                self.document = existing.document.name
         if self.document.name:
             self.original_file_name = os.path.basename(self.document.name)
         # Call the "real" save() method.
@@ -987,6 +1705,16 @@ class ImageCategoryManager(models.Manager):
             'slug',
         )
 
+    def categories_in_use(self, pks):
+        """The categories (from ``pks``) which have images (one query)."""
+        return set(Image.objects.filter(
+            category__in=pks,
+            deleted=False,
+        ).values_list(
+            'category',
+            flat=True,
+        ).distinct())
+
     def init_category(self, name):
         try:
             obj = self.model.objects.get(name=name)
@@ -1012,8 +1740,7 @@ class ImageCategory(models.Model):
 
     @property
     def in_use(self):
-        images = Image.objects.filter(category=self, deleted=False)
-        return images.count() > 0
+        return self.pk in ImageCategory.objects.categories_in_use([self.pk])
 
 
 reversion.register(ImageCategory)
@@ -1024,11 +1751,22 @@ class ImageManager(models.Manager):
     def images(self):
         return self.model.objects.all().exclude(
             deleted=True,
+        ).select_related(
+            'category',
         ).order_by(
             'category__slug',
             'title',
         )
 
+    def images_in_use(self, pks):
+        """The images (from ``pks``) used by published or pending content.
+
+        Includes foreign keys (e.g. ``Title.picture``) and many to many fields
+        (e.g. ``Title.slideshow``).  See ``_usage``.
+
+        """
+        return set(_usage(self.model, pks))
+
     def tags_by_category(self, category):
         return Tag.objects.filter(
             image__category__slug=category.slug,
@@ -1064,9 +1802,31 @@ class Image(TimeStampedModel):
     )
     deleted = models.BooleanField(default=False)
     category = models.ForeignKey(ImageCategory, blank=True, null=True)
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text='SHA-256 hash of the image (see ``file_hash``)',
+    )
+    thumbnails = models.TextField(
+        blank=True,
+        help_text='Thumbnail URLs (JSON) set by the thumbnail_image task',
+    )
+    thumbnails_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text='Thumbnail options used to create the thumbnails',
+    )
     objects = ImageManager()
     tags = TaggableManager(blank=True)
 
+    # thumbnail options for the image wizard (see ``thumbnail_url``)
+    WIZARD_THUMBNAIL = 'block.wizard'
+    WIZARD_THUMBNAIL_OPTIONS = {
+        'crop': True,
+        'size': (100, 0),
+    }
+
     class Meta:
         verbose_name = 'Link Image'
         verbose_name_plural = 'Link Images'
@@ -1075,8 +1835,28 @@ class Image(TimeStampedModel):
         return '{}. {}'.format(self.pk, self.title)
 
     def save(self, *args, **kwargs):
-        """Save the original file name."""
-        self.original_file_name = os.path.basename(self.image.name)
+        """Save the original file name.
+
+        If the image has been uploaded before, then use the same file (and
+        thumbnails).
+
+        """
+        if self.image and not self.image._committed:
+            # new file (the storage might rename it, so use the upload name)
+            self.original_file_name = os.path.basename(self.image.name)[:100]
+            self.content_hash = file_hash(self.image)
+            existing = existing_file(
+                Image, 'image', self.content_hash, self.pk
+            )
+            if existing:
+                self.image = existing.image.name
+                self.thumbnails = existing.thumbnails
+                self.thumbnails_hash = existing.thumbnails_hash
+            else:
+                self.thumbnails = ''
+                self.thumbnails_hash = ''
+        elif not self.original_file_name and self.image:
+            self.original_file_name = os.path.basename(self.image.name)[:100]
         # Call the "real" save() method.
         super().save(*args, **kwargs)
 
@@ -1084,6 +1864,24 @@ class Image(TimeStampedModel):
         self.deleted = True
         self.save()
 
+    def set_thumbnails(self, thumbnails, thumbnails_hash=''):
+        """Save the thumbnail URLs (a dict of alias and URL).
+
+        Uses ``update``, so we don't overwrite other changes to the image.
+
+        """
+        self.thumbnails = json.dumps(thumbnails, sort_keys=True)
+        self.thumbnails_hash = thumbnails_hash
+        Image.objects.filter(pk=self.pk).update(
+            thumbnails=self.thumbnails, thumbnails_hash=self.thumbnails_hash
+        )
+
+    def thumbnail_url(self, alias):
+        """The URL of a thumbnail (or ``None`` if it hasn't been created)."""
+        if self.thumbnails:
+            return json.loads(self.thumbnails).get(alias)
+        return None
+
 
 reversion.register(Image)
 
@@ -1134,6 +1932,9 @@ reversion.register(LinkCategory)
 
 class UrlManager(models.Manager):
 
+    # keep the number of query parameters below the SQLite limit (999)
+    BATCH_SIZE = 250
+
     def init_page_url(self, page):
         if page.is_custom or page.slug == Page.CUSTOM:
             raise BlockError(
@@ -1157,11 +1958,46 @@ class UrlManager(models.Manager):
         obj.save()
         return obj
 
-    def init_pages(self):
-        """Add non-custom pages to the list of URLs."""
-        for page in Page.objects.pages():
-            if not page.is_custom:
-                self.init_page_url(page)
+    def init_pages(self, page=None):
+        """Add non-custom pages to the list of URLs.
+
+        Compares the pages with the URLs in one pass.  Missing URLs are
+        created using ``bulk_create`` and changed titles are updated using
+        one query (for each batch).  If ``page`` is set, then only that page
+        is checked.
+
+        """
+        pages = Page.objects.pages().exclude(slug=Page.CUSTOM)
+        if page:
+            pages = pages.filter(pk=page.pk)
+        page_names = dict(pages.values_list('pk', 'name'))
+        urls = self.model.objects.filter(
+            page__in=pages,
+        ).values_list(
+            'pk', 'page_id', 'title',
+        )
+        missing = set(page_names)
+        titles = {}
+        for pk, page_id, title in urls:
+            if page_names[page_id] != title:
+                titles[pk] = page_names[page_id]
+            missing.discard(page_id)
+        self.model.objects.bulk_create([
+            self.model(
+                title=page_names[pk], url_type=self.model.PAGE, page_id=pk
+            )
+            for pk in sorted(missing)
+        ], batch_size=self.BATCH_SIZE)
+        pks = sorted(titles)
+        for start in range(0, len(pks), self.BATCH_SIZE):
+            batch = pks[start:start + self.BATCH_SIZE]
+            self.model.objects.filter(pk__in=batch).update(title=Case(
+                *[When(pk=pk, then=Value(titles[pk])) for pk in batch],
+                output_field=CharField()
+            ))
+        if missing or titles:
+            # 'bulk_create' and 'update' don't send the 'post_save' signal
+            invalidate_on_commit(invalidate_site)
 
     def init_reverse_url(self, title, name, arg1=None, arg2=None, arg3=None):
         arg1 = arg1 or ''
@@ -1255,7 +2091,7 @@ class Url(models.Model):
                 params.append(self.arg2)
             if self.arg3:
                 params.append(self.arg3)
-            result = reverse(self.name, args=params)
+            result = _reverse(self.name, args=params)
         return result
 
 
@@ -1293,10 +2129,32 @@ class LinkManager(models.Manager):
         obj.save()
         return obj
 
+    def links_in_use(self, pks):
+        """The links (from ``pks``) used by published or pending content."""
+        return set(_usage(self.model, pks))
+
+    def prefetch_usage(self, links):
+        """Find the usage for a list of links in a few queries.
+
+        Used by ``blocks_used`` and ``pages_used``, so the link list doesn't
+        run queries for each link.
+
+        """
+        links = list(links)
+        usage = _usage(self.model, [link.pk for link in links])
+        for link in links:
+            link._usage = usage.get(link.pk, [])
+        return links
+
     def links(self):
-        """List of links."""
+        """List of links (with the data needed for the ``url``)."""
         return self.model.objects.all().exclude(
             deleted=True,
+        ).select_related(
+            'category',
+            'document',
+            'url_internal',
+            'url_internal__page',
         ).order_by(
             'category__slug',
             'title',
@@ -1391,49 +2249,20 @@ class Link(TimeStampedModel):
 
     @property
     def blocks_used(self):
-        """Find all models with a foreign key to a link.
-
-        This code looks through all the tables in the database and finds all
-        the foreign keys to this link instance (``Link``).
-
-        - Check the StackOverflow article above for more information.
-        - ``link_use`` is a row from a model which contains the foreign key.
+        """Published and pending content which uses this link.
 
-        See this link for help on NestedObjects (note combine 2 lines for link)
-        http://stackoverflow.com/questions/12158714/how-to-show-related-ite
-        ms-using-deleteview-in-django
-
-        Basically NestedObjects is a helper util to find objects that have
-        defined the items in the list passed to the collect method in a
-        foreignkey relationship
+        Uses the foreign keys and many to many fields (to ``Link``) on the
+        content models (see ``_usage``).  For a list of links, use
+        ``Link.objects.prefetch_usage``.
 
         """
-        collector = NestedObjects(using='default')
-        collector.collect([self])
-        usage_list = collector.nested()
-        used = []
-        if len(usage_list) > 1:
-            for link_use in usage_list[1]:
-                if (
-                    hasattr(link_use, 'is_published') and
-                    hasattr(link_use, 'is_pending')
-                ):
-                    if link_use.is_published or link_use.is_pending:
-                        used.append(link_use)
-                    elif (
-                        hasattr(link_use, 'deleted') and
-                        not link_use.deleted
-                    ):
-                        used.append(link_use)
-        return used
+        if not hasattr(self, '_usage'):
+            self._usage = _usage(Link, [self.pk]).get(self.pk, [])
+        return self._usage
 
     @property
     def pages_used(self):
-        pages = {}
-        for section in self.blocks_used:
-            page = section.block.page_section.page
-            pages.update({page.name: page})
-        return pages.values()
+        return _pages_used(self.blocks_used)
 
     @property
     def in_use(self):
@@ -1572,6 +2401,26 @@ class ViewUrl(models.Model):
 reversion.register(ViewUrl)
 
 
+class MenuNode(namedtuple(
+        'MenuNode', 'pk slug title url page_pk children')):
+    """An item in a menu tree (see ``MenuManager.menu_tree``).
+
+    ``url`` is ``None`` if the menu item doesn't have a link.  ``page_pk`` is
+    the page for a link to a page on this site.
+
+    """
+
+    __slots__ = ()
+
+    @property
+    def has_children(self):
+        return bool(self.children)
+
+    @property
+    def has_link(self):
+        return self.url is not None
+
+
 class MenuManager(models.Manager):
 
     def create_menu(self, slug, title, navigation=True):
@@ -1619,14 +2468,73 @@ class MenuManager(models.Manager):
         """Default to menu called 'main' for now."""
         return self.model.objects.get(slug=Menu.NAVIGATION)
 
+    def menu_tree(self, menu_slug):
+        """The items in a menu (as a tree of ``MenuNode``).
+
+        The tree is built using one query.  If the menu cache is enabled,
+        the tree is cached until something on the site changes (see
+        ``block/cache.py``).
+
+        """
+        if not menu_cache_timeout():
+            return self._menu_tree(menu_slug)
+        key = menu_cache_key(menu_slug)
+        result = menu_cache_get(key)
+        if result is None:
+            result = self._menu_tree(menu_slug)
+            menu_cache_set(key, result)
+        return result
+
+    def _menu_tree(self, menu_slug):
+        items = MenuItem.objects.filter(
+            menu__slug=menu_slug,
+        ).exclude(
+            deleted=True,
+        ).select_related(
+            'link',
+            'link__document',
+            'link__url_internal',
+            'link__url_internal__page',
+        ).order_by(
+            'order',
+            'title',
+        )
+        children = {}
+        for item in items:
+            children.setdefault(item.parent_id, []).append(item)
+
+        def _node(item):
+            url = page_pk = None
+            if item.link:
+                url = item.link.url or '#'
+                if item.link.url_internal:
+                    page_pk = item.link.url_internal.page_id
+            return MenuNode(
+                pk=item.pk,
+                slug=item.slug,
+                title=item.title,
+                url=url,
+                page_pk=page_pk,
+                children=tuple(
+                    _node(child) for child in children.get(item.pk, [])
+                ),
+            )
+
+        return tuple(_node(item) for item in children.get(None, []))
+
     def navigation_menu_items(self):
-        # not all systems have a navigation menu
-        try:
-            return self.model.objects.get(
-                slug=self.model.NAVIGATION
-            ).menuitem_set.exclude(deleted=True).exclude(parent__isnull=False)
-        except self.model.DoesNotExist:
-            return self.model.objects.none()
+        """Top level items in the navigation menu.
+
+        The queryset is lazy (and empty if the site doesn't have a navigation
+        menu), so a view can add it to the context without a query.
+
+        """
+        return MenuItem.objects.filter(
+            menu__slug=self.model.NAVIGATION,
+            parent__isnull=True,
+        ).exclude(
+            deleted=True,
+        )
 
 
 class Menu(TimedCreateModifyDeleteModel):
@@ -1757,3 +2665,25 @@ class MenuItem(TimedCreateModifyDeleteModel):
 
 
 reversion.register(MenuItem)
+
+
+def _site_changed(sender, **kwargs):
+    """Every page displays the menus, header, footer and links."""
+    invalidate_on_commit(invalidate_site)
+
+
+for model in (
+        Document,
+        HeaderFooter,
+        Image,
+        Link,
+        Menu,
+        MenuItem,
+        Page,
+        PageSection,
+        Section,
+        Template,
+        TemplateSection,
+        Url):
+    post_save.connect(_site_changed, sender=model)
+    post_delete.connect(_site_changed, sender=model)
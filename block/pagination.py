@@ -0,0 +1,233 @@
+# -*- encoding: utf-8 -*-
+"""Pagination for paginated sections.
+
+Each paginated section has its own querystring parameters (using the
+section slug) e.g. ``?news-page=3`` or ``?news-cursor=...``, so sections on
+the same page are paged independently (see ``section_page``).
+
+Keyset (cursor) pagination:
+
+Django's ``Paginator`` counts the rows, then uses ``OFFSET``, so the deeper
+pages of a long section get slower.  A keyset page continues from the last
+row of the previous page (using the ``order_by_field`` and the primary key),
+so every page is one query using the index.
+
+The cursors are signed, so they are opaque to the browser and can't be
+changed.  An invalid cursor (or a cursor for a different ``order_by_field``)
+displays the first page.
+
+.. note:: The ``order_by_field`` should not be ``null``.
+
+"""
+import datetime
+import json
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime, parse_time
+from django.utils.functional import cached_property
+
+from block.cache import (
+    section_count_get,
+    section_count_key,
+    section_count_set,
+)
+
+
+CURSOR_SALT = 'block.pagination.cursor'
+# 'DjangoJSONEncoder' truncates times to milliseconds, so we keep the
+# microseconds (the value must equal the value in the row)
+CURSOR_TYPES = (
+    ('datetime', datetime.datetime, parse_datetime),
+    ('time', datetime.time, parse_time),
+)
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def _cached_count(qs, count_key):
+    if not count_key:
+        return qs.count()
+    key = section_count_key(*count_key)
+    count = section_count_get(key)
+    if count is None:
+        count = qs.count()
+        section_count_set(key, count)
+    return count
+
+
+def _field_value(obj, field_name):
+    for name in field_name.split('__'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def cursor_param(slug):
+    return '{}-cursor'.format(slug)
+
+
+def decode_cursor(cursor, field_name=None):
+    """Returns the direction, field value and primary key (or ``None``).
+
+    If ``field_name`` is set, then the cursor must be for the same field.
+
+    """
+    if cursor:
+        try:
+            result = signing.loads(cursor, salt=CURSOR_SALT)
+            if field_name is None or result['f'] == field_name:
+                value = result['v']
+                for name, value_type, parse in CURSOR_TYPES:
+                    if result.get('t') == name:
+                        value = parse(value)
+                return result['d'], value, result['pk']
+        except (signing.BadSignature, KeyError, TypeError):
+            pass
+    return None
+
+
+def encode_cursor(direction, value, pk, field_name):
+    data = {'d': direction, 'f': field_name, 'pk': pk}
+    for name, value_type, parse in CURSOR_TYPES:
+        if isinstance(value, value_type):
+            data.update({'t': name, 'v': value.isoformat()})
+            break
+    else:
+        # convert dates (and decimals) to strings
+        data['v'] = json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+    return signing.dumps(data, salt=CURSOR_SALT, compress=True)
+
+
+class KeysetPage:
+    """One page of a section (iterate over it like a Django ``Page``).
+
+    ``count`` is the (cached) number of items in the section, or ``None``
+    if the section isn't configured to count.
+
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor, count):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return '<KeysetPage: {} items>'.format(len(self.object_list))
+
+    def has_next(self):
+        return bool(self.next_cursor)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def has_previous(self):
+        return bool(self.previous_cursor)
+
+
+def keyset_page(
+        qs, order_by_field, items_per_page, cursor, count=False,
+        count_key=None):
+    """A ``KeysetPage`` for the ``cursor`` (or the first page).
+
+    Keyword arguments:
+    order_by_field -- e.g. ``-created`` (the primary key is added so the
+                      order is unique).
+    count -- should the page ``count`` the items.
+    count_key -- the page section, moderate state and version of the page
+                 section e.g. ``(12, 'published', 3)`` to cache the count.
+
+    """
+    section_qs = qs
+    field_name = order_by_field.lstrip('-') if order_by_field else 'pk'
+    descending = bool(order_by_field) and order_by_field.startswith('-')
+    decoded = decode_cursor(cursor, field_name)
+    direction = NEXT
+    if decoded:
+        direction, value, pk = decoded
+        # if the direction is previous, then we read the rows backwards
+        backwards = direction == PREVIOUS
+        after = descending == backwards
+        lookup = 'gt' if after else 'lt'
+        condition = Q(**{'pk__{}'.format(lookup): pk})
+        if field_name != 'pk':
+            condition = Q(**{'{}__{}'.format(field_name, lookup): value}) | (
+                Q(**{field_name: value}) & condition
+            )
+        qs = qs.filter(condition)
+    reverse = descending != (direction == PREVIOUS)
+    order = [field_name, 'pk'] if field_name != 'pk' else ['pk']
+    qs = qs.order_by(*[('-' if reverse else '') + x for x in order])
+    object_list = list(qs[:items_per_page + 1])
+    more = len(object_list) > items_per_page
+    object_list = object_list[:items_per_page]
+    if direction == PREVIOUS:
+        object_list.reverse()
+    next_cursor = previous_cursor = None
+    if object_list:
+        first = object_list[0]
+        last = object_list[-1]
+        if (direction == NEXT and more) or (direction == PREVIOUS and decoded):
+            next_cursor = encode_cursor(
+                NEXT, _field_value(last, field_name), last.pk, field_name
+            )
+        if (direction == NEXT and decoded) or (direction == PREVIOUS and more):
+            previous_cursor = encode_cursor(
+                PREVIOUS, _field_value(first, field_name), first.pk, field_name
+            )
+    return KeysetPage(
+        object_list,
+        next_cursor,
+        previous_cursor,
+        _cached_count(section_qs, count_key) if count else None,
+    )
+
+
+def page_param(slug):
+    return '{}-page'.format(slug)
+
+
+def section_page(query_dict, slug):
+    """The page number and cursor for a section (from ``request.GET``).
+
+    ``page`` (without the slug) is used by every section, so links from
+    before the parameters included the slug still work.  A cursor is only
+    for one section, so we don't use ``cursor`` (without the slug).
+
+    """
+    page_number = query_dict.get(page_param(slug), query_dict.get('page'))
+    cursor = query_dict.get(cursor_param(slug))
+    return page_number, cursor
+
+
+def section_page_key(query_dict, slug):
+    """The page of the section (for a cache key)."""
+    page_number, cursor = section_page(query_dict, slug)
+    if cursor:
+        return 'cursor.{}'.format(cursor)
+    return page_number or ''
+
+
+class SectionPaginator(Paginator):
+    """Cache the count for the page section (see ``section_count_key``)."""
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key and hasattr(self.object_list, 'count'):
+            return _cached_count(self.object_list, self.count_key)
+        return super().count
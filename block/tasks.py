@@ -1,15 +1,160 @@
 # -*- encoding: utf-8 -*-
-from block.models import Image
+import hashlib
+import json
+import time
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from block.models import Image, Page, Template
 from celery import shared_task
 from django.conf import settings
-from easy_thumbnails.files import generate_all_aliases
+from django.db import connections
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import get_thumbnailer
+
+
+class ThumbnailProgress(namedtuple(
+        'ThumbnailProgress',
+        'count errors last_pk seconds skipped total')):
+    """Progress of ``rebuild_thumbnails``.
+
+    To resume, use ``last_pk + 1`` as the ``start_pk``.
+
+    """
+
+    __slots__ = ()
+
+    @property
+    def per_second(self):
+        if self.seconds:
+            return self.count / self.seconds
+        return 0.0
+
+
+def thumbnails_hash():
+    """A hash of the thumbnail options (changes when the aliases change)."""
+    options = {
+        'aliases': getattr(settings, 'THUMBNAIL_ALIASES', None),
+        'wizard': Image.WIZARD_THUMBNAIL_OPTIONS,
+    }
+    value = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def create_thumbnails(img, options_hash=None):
+    """Create the thumbnails, and save the URLs (``Image.thumbnails``)."""
+    thumbnailer = get_thumbnailer(img.image)
+    options = dict(aliases.all(img.image, include_global=True))
+    options[Image.WIZARD_THUMBNAIL] = Image.WIZARD_THUMBNAIL_OPTIONS
+    thumbnails = {
+        alias: thumbnailer.get_thumbnail(value).url
+        for alias, value in options.items()
+    }
+    img.set_thumbnails(thumbnails, options_hash or thumbnails_hash())
+
+
+def _rebuild_thumbnail(image_pk, options_hash):
+    """Runs in the process pool, so must not raise an exception."""
+    try:
+        img = Image.objects.get(pk=image_pk)
+        create_thumbnails(img, options_hash)
+        error = None
+    except Exception as e:
+        error = '{}: {}'.format(e.__class__.__name__, e)
+    return image_pk, error
+
+
+def rebuild_thumbnails(
+        queryset=None, workers=None, batch_size=100, start_pk=None,
+        force=False, callback=None):
+    """Create the thumbnails for the images (using a process pool).
+
+    Keyword arguments:
+    queryset -- the images (defaults to images which are not deleted).
+    workers -- size of the process pool (``None`` for the number of CPUs,
+               ``0`` to create the thumbnails in this process).
+    start_pk -- resume from this primary key.
+    force -- rebuild images where the thumbnails are current.
+    callback -- called with the ``ThumbnailProgress`` after each batch.
+
+    Images are processed in primary key order, one batch at a time, so the
+    pool never has more than ``batch_size`` images queued.
+
+    """
+    if queryset is None:
+        queryset = Image.objects.filter(deleted=False)
+    if start_pk:
+        queryset = queryset.filter(pk__gte=start_pk)
+    options_hash = thumbnails_hash()
+    total = queryset.count()
+    if not force:
+        queryset = queryset.exclude(thumbnails_hash=options_hash)
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    progress = ThumbnailProgress(
+        count=0,
+        errors=[],
+        last_pk=None,
+        seconds=0.0,
+        skipped=total - len(pks),
+        total=total,
+    )
+    executor = None
+    if workers != 0 and pks:
+        # the pool processes must not share our database connection
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers)
+    start = time.time()
+    try:
+        for index in range(0, len(pks), batch_size):
+            batch = pks[index:index + batch_size]
+            hashes = [options_hash] * len(batch)
+            if executor:
+                result = executor.map(_rebuild_thumbnail, batch, hashes)
+            else:
+                result = map(_rebuild_thumbnail, batch, hashes)
+            errors = [(pk, error) for pk, error in result if error]
+            progress = progress._replace(
+                count=progress.count + len(batch),
+                errors=progress.errors + errors,
+                last_pk=batch[-1],
+                seconds=time.time() - start,
+            )
+            if callback:
+                callback(progress)
+    finally:
+        if executor:
+            executor.shutdown()
+    return progress
+
+
+@shared_task
+def rebuild_thumbnails_task(force=False):
+    """Celery workers can't start a process pool, so use this process."""
+    progress = rebuild_thumbnails(workers=0, force=force)
+    return progress.count
+
+
+@shared_task
+def refresh_sections_from_template(template_pk):
+    """Update the page sections (for a template used by lots of pages)."""
+    try:
+        template = Template.objects.get(pk=template_pk)
+    except Template.DoesNotExist:
+        template = None
+    if template:
+        Page.objects.refresh_sections_from_template(template, background=False)
 
 
 @shared_task
 def thumbnail_image(image_pk):
+    """Create the thumbnails, and save the URLs (``Image.thumbnails``)."""
     try:
         img = Image.objects.get(id=image_pk)
     except Image.DoesNotExist:
         img = None
     if img:
-        generate_all_aliases(img.image, include_global=True)
+        options_hash = thumbnails_hash()
+        # the thumbnails are current if the file was uploaded before
+        if img.thumbnails_hash != options_hash:
+            create_thumbnails(img, options_hash)
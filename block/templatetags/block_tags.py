@@ -1,9 +1,53 @@
 # -*- encoding: utf-8 -*-
 from django import template
+from django.http import QueryDict
+
+from block.cache import (
+    section_cache_get,
+    section_cache_key,
+    section_cache_set,
+)
+from block.pagination import cursor_param, page_param, section_page_key
 
 register = template.Library()
 
 
+class BlockSectionCacheNode(template.Node):
+
+    def __init__(self, nodelist, slug, timeout):
+        self.nodelist = nodelist
+        self.slug = slug
+        self.timeout = timeout
+
+    def render(self, context):
+        slug = self.slug.resolve(context)
+        page_section = context.get('{}_page_section'.format(slug))
+        if context.get('design') or page_section is None:
+            # design mode displays 'pending' content (which isn't versioned)
+            return self.nodelist.render(context)
+        timeout = None
+        if self.timeout:
+            timeout = int(self.timeout.resolve(context))
+        page_number = ''
+        request = context.get('request')
+        if request:
+            # only the page of this section (see ``block/pagination.py``)
+            page_number = section_page_key(request.GET, slug)
+        key = section_cache_key(
+            page_section.pk, page_number, page_section.version
+        )
+        value = section_cache_get(key)
+        metrics = getattr(context.get('view'), 'metrics', None)
+        if value is None:
+            if metrics:
+                metrics.cache_miss('section-{}'.format(slug))
+            value = self.nodelist.render(context)
+            section_cache_set(key, value, timeout)
+        elif metrics:
+            metrics.cache_hit('section-{}'.format(slug))
+        return value
+
+
 @register.inclusion_tag('block/_add.html')
 def block_add(url, caption="", return_path=None):
     return dict(url=url, caption=caption, return_path=return_path)
@@ -18,6 +62,64 @@ def block_moderate(
     )
 
 
+@register.tag('block_section_cache')
+def block_section_cache(parser, token):
+    """Cache the HTML for a section of the page e.g::
+
+      {% block_section_cache 'body' %}
+        {% for c in body_list %}
+          ...
+        {% endfor %}
+      {% endblock_section_cache %}
+
+    An optional second parameter is the timeout (in seconds).
+
+    The cache key includes a version number which changes when content in the
+    page section is published or removed.
+
+    """
+    bits = token.split_contents()
+    if len(bits) not in (2, 3):
+        raise template.TemplateSyntaxError(
+            "'{}' tag requires a section slug (and an optional "
+            "timeout)".format(bits[0])
+        )
+    nodelist = parser.parse(('endblock_section_cache',))
+    parser.delete_first_token()
+    timeout = None
+    if len(bits) == 3:
+        timeout = parser.compile_filter(bits[2])
+    return BlockSectionCacheNode(
+        nodelist, parser.compile_filter(bits[1]), timeout
+    )
+
+
+@register.simple_tag(takes_context=True)
+def block_page_query(context, slug, page=None, cursor=None):
+    """The querystring for a page of a paginated section e.g::
+
+      <a href="{% block_page_query 'news' page=news_list.next_page_number %}">
+      <a href="{% block_page_query 'news' cursor=news_list.next_cursor %}">
+
+    The page of the other sections is kept.
+
+    """
+    request = context.get('request')
+    if request:
+        query = request.GET.copy()
+    else:
+        query = QueryDict(mutable=True)
+    for name in ('page', 'cursor', page_param(slug), cursor_param(slug)):
+        query.pop(name, None)
+    if page:
+        query[page_param(slug)] = str(page)
+    if cursor:
+        query[cursor_param(slug)] = cursor
+    if query:
+        return '?{}'.format(query.urlencode())
+    return '?'
+
+
 @register.inclusion_tag('block/_status.html')
 def block_status(generic_content):
     return dict(c=generic_content)
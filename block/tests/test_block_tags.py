@@ -0,0 +1,66 @@
+# -*- encoding: utf-8 -*-
+import pytest
+
+from django.core.cache import cache
+from django.template import Context, Template, TemplateSyntaxError
+
+from block.cache import invalidate_section
+from block.tests.factories import PageSectionFactory
+
+
+TEMPLATE = (
+    "{% load block_tags %}"
+    "{% block_section_cache 'body' %}{{ fruit }}{% endblock_section_cache %}"
+)
+
+
+def _render(**kwargs):
+    return Template(TEMPLATE).render(Context(kwargs))
+
+
+@pytest.mark.django_db
+def test_block_section_cache():
+    cache.clear()
+    page_section = PageSectionFactory()
+    assert 'Apple' == _render(body_page_section=page_section, fruit='Apple')
+    assert 'Apple' == _render(body_page_section=page_section, fruit='Orange')
+
+
+@pytest.mark.django_db
+def test_block_section_cache_design():
+    cache.clear()
+    page_section = PageSectionFactory()
+    _render(body_page_section=page_section, fruit='Apple', design=True)
+    assert 'Orange' == _render(
+        body_page_section=page_section, fruit='Orange', design=True
+    )
+
+
+@pytest.mark.django_db
+def test_block_section_cache_invalidate():
+    cache.clear()
+    page_section = PageSectionFactory()
+    assert 'Apple' == _render(body_page_section=page_section, fruit='Apple')
+    invalidate_section(page_section)
+    assert 'Orange' == _render(body_page_section=page_section, fruit='Orange')
+
+
+def test_block_section_cache_no_page_section():
+    assert 'Apple' == _render(fruit='Apple')
+
+
+def test_block_section_cache_syntax():
+    with pytest.raises(TemplateSyntaxError):
+        Template(
+            "{% load block_tags %}"
+            "{% block_section_cache %}{% endblock_section_cache %}"
+        )
+
+
+@pytest.mark.django_db
+def test_block_section_cache_version():
+    cache.clear()
+    page_section = PageSectionFactory()
+    assert 'Apple' == _render(body_page_section=page_section, fruit='Apple')
+    page_section.version = 2
+    assert 'Orange' == _render(body_page_section=page_section, fruit='Orange')
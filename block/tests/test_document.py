@@ -12,3 +12,14 @@ def test_document_factory():
 @pytest.mark.django_db
 def test_document_str():
     str(DocumentFactory())
+
+
+@pytest.mark.django_db
+def test_content_hash_reuse_file():
+    d1 = DocumentFactory(document__data=b'minutes')
+    d2 = DocumentFactory(document__data=b'minutes')
+    d3 = DocumentFactory(document__data=b'agenda')
+    assert d1.content_hash == d2.content_hash
+    assert d1.document.name == d2.document.name
+    assert d1.content_hash != d3.content_hash
+    assert d1.document.name != d3.document.name
@@ -1,7 +1,16 @@
 # -*- encoding: utf-8 -*-
 import pytest
 
+from django.core.cache import cache
+
+from block.cache import thumbnail_queue_add
+from block.forms import (
+    THUMBNAIL_PLACEHOLDER,
+    _label_from_instance,
+    _thumbnail_url,
+)
 from block.models import Image
+from block.tasks import thumbnail_image
 from block.tests.factories import ImageCategoryFactory, ImageFactory
 
 
@@ -26,3 +35,115 @@ def test_tags_by_category():
     i3.tags.add('b')
     qs = Image.objects.tags_by_category(category)
     assert [('b', 2), ('a', 1)] == [(x.slug, x.num_tags) for x in qs]
+
+
+@pytest.mark.django_db
+def test_thumbnail_url():
+    image = ImageFactory()
+    assert image.thumbnail_url(Image.WIZARD_THUMBNAIL) is None
+    image.set_thumbnails({Image.WIZARD_THUMBNAIL: '/media/thumb.jpg'})
+    image = Image.objects.get(pk=image.pk)
+    assert '/media/thumb.jpg' == image.thumbnail_url(Image.WIZARD_THUMBNAIL)
+    assert image.thumbnail_url('does-not-exist') is None
+
+
+@pytest.mark.django_db
+def test_thumbnail_image():
+    image = ImageFactory()
+    thumbnail_image(image.pk)
+    image = Image.objects.get(pk=image.pk)
+    url = image.thumbnail_url(Image.WIZARD_THUMBNAIL)
+    assert url
+    # global alias (``THUMBNAIL_ALIASES`` in ``example_block/base.py``)
+    assert image.thumbnail_url('100x0')
+
+
+@pytest.mark.django_db
+def test_thumbnail_url_wizard_label():
+    """The label uses the saved URL (rather than creating the thumbnail)."""
+    image = ImageFactory()
+    image.set_thumbnails({Image.WIZARD_THUMBNAIL: '/media/thumb.jpg'})
+    image.tags.add('cat', 'dog')
+    image = Image.objects.prefetch_related('tags').get(pk=image.pk)
+    label = _label_from_instance(image)
+    assert '/media/thumb.jpg' in label
+    assert 'cat, dog' in label or 'dog, cat' in label
+
+
+@pytest.mark.django_db
+def test_content_hash():
+    image = ImageFactory()
+    assert 64 == len(image.content_hash)
+
+
+@pytest.mark.django_db
+def test_content_hash_different():
+    i1 = ImageFactory(image__color='red')
+    i2 = ImageFactory(image__color='blue')
+    assert i1.content_hash != i2.content_hash
+    assert i1.image.name != i2.image.name
+
+
+@pytest.mark.django_db
+def test_content_hash_reuse_file():
+    i1 = ImageFactory()
+    i1.set_thumbnails({Image.WIZARD_THUMBNAIL: '/media/thumb.jpg'}, 'abc')
+    i2 = ImageFactory()
+    assert i1.content_hash == i2.content_hash
+    assert i1.image.name == i2.image.name
+    assert '/media/thumb.jpg' == i2.thumbnail_url(Image.WIZARD_THUMBNAIL)
+    assert 'abc' == i2.thumbnails_hash
+
+
+@pytest.mark.django_db
+def test_save_keeps_thumbnails():
+    """Saving an image (without a new file) keeps the thumbnails."""
+    ImageFactory(image__color='red')
+    # the storage renames the file e.g. ``example_abc123.jpg``
+    image = ImageFactory(image__color='blue')
+    assert 'example.jpg' == image.original_file_name
+    image.set_thumbnails({Image.WIZARD_THUMBNAIL: '/media/thumb.jpg'}, 'abc')
+    image = Image.objects.get(pk=image.pk)
+    image.title = 'Apple'
+    image.save()
+    image = Image.objects.get(pk=image.pk)
+    assert 'example.jpg' == image.original_file_name
+    assert '/media/thumb.jpg' == image.thumbnail_url(Image.WIZARD_THUMBNAIL)
+    assert 'abc' == image.thumbnails_hash
+
+
+@pytest.mark.django_db
+def test_thumbnail_url_placeholder():
+    """If the thumbnail doesn't exist, then queue the task."""
+    cache.clear()
+    image = ImageFactory()
+    assert THUMBNAIL_PLACEHOLDER == _thumbnail_url(image)
+    # the task runs in the tests (``CELERY_ALWAYS_EAGER``)
+    image = Image.objects.get(pk=image.pk)
+    assert image.thumbnail_url(Image.WIZARD_THUMBNAIL)
+
+
+@pytest.mark.django_db
+def test_thumbnail_url_queue_once():
+    cache.clear()
+    image = ImageFactory()
+    _thumbnail_url(image)
+    Image.objects.filter(pk=image.pk).update(thumbnails='', thumbnails_hash='')
+    image = Image.objects.get(pk=image.pk)
+    assert THUMBNAIL_PLACEHOLDER == _thumbnail_url(image)
+    # the task was not queued again
+    image = Image.objects.get(pk=image.pk)
+    assert image.thumbnail_url(Image.WIZARD_THUMBNAIL) is None
+
+
+@pytest.mark.django_db
+def test_thumbnail_url_broker_error(monkeypatch):
+    def _delay(image_pk):
+        raise OSError('Connection refused')
+
+    cache.clear()
+    image = ImageFactory()
+    monkeypatch.setattr(thumbnail_image, 'delay', _delay)
+    assert THUMBNAIL_PLACEHOLDER == _thumbnail_url(image)
+    # the task can be queued next time
+    assert thumbnail_queue_add(image.pk) is True
@@ -33,3 +33,16 @@ def test_in_use_deleted():
 def test_in_use_not():
     c = ImageCategoryFactory()
     assert c.in_use is False
+
+
+@pytest.mark.django_db
+def test_categories_in_use():
+    c1 = ImageCategoryFactory()
+    c2 = ImageCategoryFactory()
+    c3 = ImageCategoryFactory()
+    ImageFactory(category=c1)
+    ImageFactory(category=c1)
+    ImageFactory(category=c2, deleted=True)
+    assert {c1.pk} == ImageCategory.objects.categories_in_use(
+        [c1.pk, c2.pk, c3.pk]
+    )
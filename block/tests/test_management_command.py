@@ -1,13 +1,38 @@
 # -*- encoding: utf-8 -*-
+import io
+import os
+import PIL
+import tempfile
+import zipfile
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils.six import StringIO
 
-from block.tests.factories import PageFactory
+from block.models import Document, Image
+from block.tests.factories import DocumentFactory, ImageFactory, PageFactory
 from block.management.commands import (
     demo_data_block,
     init_app_block,
 )
 
 
+def _image_data(colour):
+    fp = io.BytesIO()
+    PIL.Image.new('RGB', (4, 4), colour).save(fp, 'png')
+    return fp.getvalue()
+
+
+def _image_files():
+    """Path and content for the images to import (one is a duplicate)."""
+    return [
+        ('Sport/cricket/bat.png', _image_data('red')),
+        ('Sport/cricket/copy_of_bat.png', _image_data('red')),
+        ('Sport/tennis_ball.png', _image_data('green')),
+        ('notes.txt', b'not an image'),
+    ]
+
+
 class TestCommand(TestCase):
 
     def test_demo_data(self):
@@ -20,3 +45,115 @@ class TestCommand(TestCase):
         PageFactory()
         command = init_app_block.Command()
         command.handle()
+
+    def test_rebuild_thumbnail(self):
+        image = ImageFactory()
+        out = StringIO()
+        call_command('rebuild_thumbnail_block', workers=0, stdout=out)
+        self.assertIn('Created thumbnails for 1 images', out.getvalue())
+        image = Image.objects.get(pk=image.pk)
+        self.assertTrue(image.thumbnail_url(Image.WIZARD_THUMBNAIL))
+        # the thumbnails are current, so skip
+        out = StringIO()
+        call_command('rebuild_thumbnail_block', workers=0, stdout=out)
+        self.assertIn('for 0 images', out.getvalue())
+        self.assertIn('skipped 1', out.getvalue())
+
+    def test_dedupe_file(self):
+        d1 = DocumentFactory(document__data=b'minutes')
+        # uploaded before we stored the content hash
+        Document.objects.update(content_hash='')
+        d2 = DocumentFactory(document__data=b'minutes')
+        Document.objects.update(content_hash='')
+        old_name = d2.document.name
+        self.assertNotEqual(d1.document.name, old_name)
+        out = StringIO()
+        call_command('dedupe_file_block', delete_files=True, stdout=out)
+        self.assertIn('1 duplicate rows, 1 unused files', out.getvalue())
+        d2.refresh_from_db()
+        self.assertEqual(d1.document.name, d2.document.name)
+        self.assertFalse(d2.document.storage.exists(old_name))
+
+    def test_dedupe_file_dry_run(self):
+        ImageFactory(image__color='red')
+        out = StringIO()
+        call_command('dedupe_file_block', dry_run=True, stdout=out)
+        self.assertIn('Dry run', out.getvalue())
+
+    def test_dedupe_file_dry_run_no_hash(self):
+        """A dry run calculates the hashes (but doesn't save them)."""
+        d1 = DocumentFactory(document__data=b'minutes')
+        # uploaded before we stored the content hash
+        Document.objects.update(content_hash='')
+        d2 = DocumentFactory(document__data=b'minutes')
+        Document.objects.update(content_hash='')
+        out = StringIO()
+        call_command('dedupe_file_block', dry_run=True, stdout=out)
+        self.assertIn(
+            'calculated 2 hashes, 1 duplicate rows, 1 unused files',
+            out.getvalue(),
+        )
+        d2.refresh_from_db()
+        self.assertEqual('', d2.content_hash)
+        self.assertNotEqual(d1.document.name, d2.document.name)
+
+    def test_dedupe_file_original_file_name(self):
+        i1 = ImageFactory(image__color='red')
+        Image.objects.update(content_hash='')
+        i2 = ImageFactory(image__color='red')
+        Image.objects.filter(pk=i2.pk).update(
+            content_hash='', original_file_name='apple.jpg'
+        )
+        call_command('dedupe_file_block', stdout=StringIO())
+        i2.refresh_from_db()
+        self.assertEqual(i1.image.name, i2.image.name)
+        self.assertEqual('apple.jpg', i2.original_file_name)
+
+    def test_import_image(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for name, data in _image_files():
+                file_name = os.path.join(folder, name)
+                os.makedirs(os.path.dirname(file_name), exist_ok=True)
+                with open(file_name, 'wb') as f:
+                    f.write(data)
+            out = StringIO()
+            call_command('import_image_block', folder, workers=0, stdout=out)
+            self.assertIn('Imported 2 images, skipped 1', out.getvalue())
+            # run again, and the images are skipped
+            out = StringIO()
+            call_command('import_image_block', folder, workers=0, stdout=out)
+            self.assertIn('Imported 0 images, skipped 3', out.getvalue())
+        self.assertEqual(2, Image.objects.count())
+        image = Image.objects.get(title='bat')
+        self.assertEqual('Sport', image.category.name)
+        self.assertEqual(['cricket'], list(image.tags.names()))
+        # the name of the file before the storage (might have) renamed it
+        self.assertEqual('bat.png', image.original_file_name)
+        self.assertTrue(image.thumbnail_url(Image.WIZARD_THUMBNAIL))
+        image = Image.objects.get(title='tennis ball')
+        self.assertEqual('Sport', image.category.name)
+        self.assertEqual([], list(image.tags.names()))
+
+    def test_import_image_zip_manifest(self):
+        with tempfile.TemporaryDirectory() as folder:
+            zip_name = os.path.join(folder, 'images.zip')
+            with zipfile.ZipFile(zip_name, 'w') as zip_file:
+                for name, data in _image_files():
+                    zip_file.writestr(name, data)
+            manifest = os.path.join(folder, 'manifest.csv')
+            with open(manifest, 'w') as f:
+                f.write('path,title,category,tags\n')
+                f.write('Sport/tennis_ball.png,Ball,Tennis,"grass, summer"\n')
+            out = StringIO()
+            call_command(
+                'import_image_block',
+                zip_name,
+                manifest=manifest,
+                no_thumbnails=True,
+                stdout=out,
+            )
+        self.assertIn('Imported 2 images', out.getvalue())
+        image = Image.objects.get(title='Ball')
+        self.assertEqual('Tennis', image.category.name)
+        self.assertEqual(['grass', 'summer'], sorted(image.tags.names()))
+        self.assertEqual('', image.thumbnails)
@@ -2,13 +2,23 @@
 import pytest
 
 # from django.core.urlresolvers import reverse
-from django.db import IntegrityError
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.template.loader import render_to_string
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
 from block.models import (
+    Link,
     Menu,
+    Url,
 )
 from block.tests.factories import (
+    LinkFactory,
     MenuFactory,
+    MenuItemFactory,
+    PageFactory,
 )
 
 
@@ -58,3 +68,97 @@ def test_init_menu_update_is_navigation():
     )
     assert menu.title == 'test'
     assert menu.navigation
+
+
+def _menu_tree_setup():
+    cache.clear()
+    menu = MenuFactory(slug=Menu.NAVIGATION)
+    page = PageFactory(slug='apple', slug_menu='')
+    url = Url.objects.init_page_url(page)
+    parent = MenuItemFactory(
+        menu=menu,
+        title='Fruit',
+        order=1,
+        link=LinkFactory(link_type=Link.URL_INTERNAL, url_internal=url),
+    )
+    MenuItemFactory(
+        menu=menu,
+        parent=parent,
+        title='Orange',
+        order=2,
+        link=LinkFactory(url_external='https://www.kbsoftware.co.uk/'),
+    )
+    MenuItemFactory(menu=menu, parent=parent, title='Deleted', deleted=True)
+    MenuItemFactory(menu=menu, title='Veg', order=3)
+    return page, parent
+
+
+@pytest.mark.django_db
+def test_menu_tree():
+    page, parent = _menu_tree_setup()
+    result = Menu.objects.menu_tree(Menu.NAVIGATION)
+    assert ['Fruit', 'Veg'] == [node.title for node in result]
+    fruit, veg = result
+    assert page.get_absolute_url() == fruit.url
+    assert page.pk == fruit.page_pk
+    assert ['Orange'] == [node.title for node in fruit.children]
+    assert 'https://www.kbsoftware.co.uk/' == fruit.children[0].url
+    assert fruit.has_children is True
+    assert veg.has_link is False
+    assert veg.has_children is False
+
+
+@pytest.mark.django_db
+@override_settings(BLOCK_MENU_CACHE_TIMEOUT=3600)
+def test_menu_tree_cache():
+    _menu_tree_setup()
+    with CaptureQueriesContext(connection) as queries:
+        Menu.objects.menu_tree(Menu.NAVIGATION)
+    assert 1 == len(queries)
+    with CaptureQueriesContext(connection) as queries:
+        Menu.objects.menu_tree(Menu.NAVIGATION)
+    assert 0 == len(queries)
+
+
+@pytest.mark.django_db
+def test_menu_tree_cache_disabled():
+    """The menu cache is disabled by default."""
+    _menu_tree_setup()
+    Menu.objects.menu_tree(Menu.NAVIGATION)
+    with CaptureQueriesContext(connection) as queries:
+        Menu.objects.menu_tree(Menu.NAVIGATION)
+    assert 1 == len(queries)
+
+
+@pytest.mark.django_db
+@override_settings(BLOCK_MENU_CACHE_TIMEOUT=3600)
+def test_menu_tree_invalidate():
+    page, parent = _menu_tree_setup()
+    Menu.objects.menu_tree(Menu.NAVIGATION)
+    parent.title = 'Fruit and Nuts'
+    parent.save()
+    result = Menu.objects.menu_tree(Menu.NAVIGATION)
+    assert 'Fruit and Nuts' == result[0].title
+
+
+@pytest.mark.django_db
+def test_navigation_menu_items_lazy():
+    _menu_tree_setup()
+    with CaptureQueriesContext(connection) as queries:
+        qs = Menu.objects.navigation_menu_items()
+    assert 0 == len(queries)
+    assert ['Fruit', 'Veg'] == [x.title for x in qs]
+
+
+@pytest.mark.django_db
+def test_pure_menu_main_menu_items():
+    """The template still renders the (old) ``main_menu_items``."""
+    page, parent = _menu_tree_setup()
+    html = render_to_string('block/_pure_menu.html', {
+        'main_menu_items': Menu.objects.navigation_menu_items(),
+        'page': page,
+        'user': AnonymousUser(),
+    })
+    assert 'Fruit' in html
+    assert 'Orange' in html
+    assert 'Veg' in html
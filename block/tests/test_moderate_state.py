@@ -0,0 +1,49 @@
+# -*- encoding: utf-8 -*-
+from django.test import TestCase
+
+from block.models import EditState, ModerateState
+
+
+class TestModerateState(TestCase):
+
+    def setUp(self):
+        EditState.objects.clear_cache()
+        ModerateState.objects.clear_cache()
+
+    def tearDown(self):
+        # the test transaction is rolled back without sending any signals
+        ModerateState.objects.clear_cache()
+
+    def test_cache(self):
+        """The lookup table is read once, then served from the cache."""
+        with self.assertNumQueries(1):
+            pending = ModerateState.objects._pending()
+            published = ModerateState.objects._published()
+            removed = ModerateState.objects._removed()
+        with self.assertNumQueries(0):
+            assert pending == ModerateState.objects._pending()
+            assert published == ModerateState.objects._published()
+            assert removed == ModerateState.objects._removed()
+        assert ModerateState.PENDING == pending.slug
+        assert ModerateState.PUBLISHED == published.slug
+        assert ModerateState.REMOVED == removed.slug
+
+    def test_cache_edit_state(self):
+        with self.assertNumQueries(1):
+            EditState.objects._add()
+            EditState.objects._edit()
+            EditState.objects._push()
+        with self.assertNumQueries(0):
+            assert EditState.ADD == EditState.objects._add().slug
+
+    def test_cache_refresh(self):
+        """Saving a state row clears the cache."""
+        pending = ModerateState.objects._pending()
+        pending.name = 'Waiting'
+        pending.save()
+        with self.assertNumQueries(1):
+            assert 'Waiting' == ModerateState.objects._pending().name
+
+    def test_does_not_exist(self):
+        with self.assertRaises(ModerateState.DoesNotExist):
+            ModerateState.objects._state('does-not-exist')
@@ -0,0 +1,210 @@
+# -*- encoding: utf-8 -*-
+import pytest
+
+from datetime import timedelta
+from django.core.cache import cache
+from django.http import QueryDict
+from django.template import Context, Template
+from django.test import RequestFactory
+from django.utils import timezone
+
+from block.models import Page
+from block.pagination import (
+    SectionPaginator,
+    decode_cursor,
+    encode_cursor,
+    keyset_page,
+    section_page,
+    section_page_key,
+)
+from block.tests.factories import PageFactory
+
+
+def _names(page):
+    return [x.name for x in page]
+
+
+def _pages():
+    for order, name in ((3, 'c'), (1, 'a'), (5, 'e'), (2, 'b'), (4, 'd')):
+        PageFactory(order=order, name=name)
+    return Page.objects.all()
+
+
+@pytest.mark.django_db
+def test_keyset_page():
+    qs = _pages()
+    page = keyset_page(qs, 'order', 2, None)
+    assert ['a', 'b'] == _names(page)
+    assert page.has_next() is True
+    assert page.has_previous() is False
+    assert page.count is None
+    page = keyset_page(qs, 'order', 2, page.next_cursor)
+    assert ['c', 'd'] == _names(page)
+    assert page.has_previous() is True
+    page = keyset_page(qs, 'order', 2, page.next_cursor)
+    assert ['e'] == _names(page)
+    assert page.has_next() is False
+    page = keyset_page(qs, 'order', 2, page.previous_cursor)
+    assert ['c', 'd'] == _names(page)
+    page = keyset_page(qs, 'order', 2, page.previous_cursor)
+    assert ['a', 'b'] == _names(page)
+    assert page.has_previous() is False
+    assert page.has_next() is True
+
+
+@pytest.mark.django_db
+def test_keyset_page_count():
+    cache.clear()
+    qs = _pages()
+    page = keyset_page(qs, 'order', 2, None, True, (1, 'published'))
+    assert 5 == page.count
+    # the count is cached
+    PageFactory(order=6)
+    page = keyset_page(
+        qs, 'order', 2, page.next_cursor, True, (1, 'published')
+    )
+    assert 5 == page.count
+    # not cached
+    page = keyset_page(qs, 'order', 2, None, True)
+    assert 6 == page.count
+
+
+@pytest.mark.django_db
+def test_keyset_page_descending():
+    qs = _pages()
+    page = keyset_page(qs, '-order', 3, None)
+    assert ['e', 'd', 'c'] == _names(page)
+    page = keyset_page(qs, '-order', 3, page.next_cursor)
+    assert ['b', 'a'] == _names(page)
+    page = keyset_page(qs, '-order', 3, page.previous_cursor)
+    assert ['e', 'd', 'c'] == _names(page)
+
+
+@pytest.mark.django_db
+def test_keyset_page_invalid_cursor():
+    """An invalid cursor displays the first page."""
+    page = keyset_page(_pages(), 'order', 2, 'not-a-cursor')
+    assert ['a', 'b'] == _names(page)
+
+
+@pytest.mark.django_db
+def test_keyset_page_same_value():
+    """The primary key is used when the values are the same."""
+    for name in ('a', 'b', 'c'):
+        PageFactory(order=1, name=name)
+    qs = Page.objects.all()
+    first = keyset_page(qs, 'order', 2, None)
+    second = keyset_page(qs, 'order', 2, first.next_cursor)
+    assert ['a', 'b', 'c'] == sorted(_names(first) + _names(second))
+
+
+@pytest.mark.django_db
+def test_keyset_page_count_version():
+    """The count is cached for the version of the page section."""
+    cache.clear()
+    qs = _pages()
+    page = keyset_page(qs, 'order', 2, None, True, (1, 'published', 1))
+    assert 5 == page.count
+    PageFactory(order=6)
+    page = keyset_page(qs, 'order', 2, None, True, (1, 'published', 2))
+    assert 6 == page.count
+
+
+@pytest.mark.django_db
+def test_keyset_page_created():
+    """The cursor keeps the microseconds of a date and time."""
+    created = timezone.now().replace(microsecond=1000)
+    for count, name in enumerate(('a', 'b', 'c', 'd', 'e')):
+        page = PageFactory(name=name)
+        Page.objects.filter(pk=page.pk).update(
+            created=created + timedelta(microseconds=count)
+        )
+    qs = Page.objects.all()
+    page = keyset_page(qs, 'created', 2, None)
+    assert ['a', 'b'] == _names(page)
+    page = keyset_page(qs, 'created', 2, page.next_cursor)
+    assert ['c', 'd'] == _names(page)
+    page = keyset_page(qs, '-created', 2, None)
+    assert ['e', 'd'] == _names(page)
+    page = keyset_page(qs, '-created', 2, page.next_cursor)
+    assert ['c', 'b'] == _names(page)
+    page = keyset_page(qs, '-created', 2, page.next_cursor)
+    assert ['a'] == _names(page)
+
+
+def test_decode_cursor():
+    assert decode_cursor(None) is None
+    assert decode_cursor('abc') is None
+
+
+def test_decode_cursor_field_name():
+    """A cursor for a different field is ignored."""
+    cursor = encode_cursor('n', 3, 12, 'order')
+    assert ('n', 3, 12) == decode_cursor(cursor, 'order')
+    assert decode_cursor(cursor, 'created') is None
+
+
+def test_decode_cursor_datetime():
+    created = timezone.now().replace(microsecond=123456)
+    cursor = encode_cursor('n', created, 12, 'created')
+    assert ('n', created, 12) == decode_cursor(cursor, 'created')
+
+
+def test_block_page_query():
+    request = RequestFactory().get('/', {'news-page': 2, 'events-page': 3})
+    template = Template(
+        "{% load block_tags %}{% block_page_query 'news' page=4 %}"
+    )
+    result = QueryDict(template.render(Context({'request': request}))[1:])
+    assert {'news-page': '4', 'events-page': '3'} == result.dict()
+
+
+def test_block_page_query_cursor():
+    request = RequestFactory().get('/', {'page': 2, 'news-page': 2})
+    template = Template(
+        "{% load block_tags %}{% block_page_query 'news' cursor='abc' %}"
+    )
+    result = template.render(Context({'request': request}))
+    assert '?news-cursor=abc' == result
+
+
+def test_section_page():
+    query_dict = QueryDict('news-page=2&events-cursor=abc')
+    assert ('2', None) == section_page(query_dict, 'news')
+    assert (None, 'abc') == section_page(query_dict, 'events')
+    assert (None, None) == section_page(query_dict, 'body')
+
+
+def test_section_page_fallback():
+    """Links from before the parameters included the slug."""
+    query_dict = QueryDict('page=3&news-page=2')
+    assert ('2', None) == section_page(query_dict, 'news')
+    assert ('3', None) == section_page(query_dict, 'events')
+
+
+def test_section_page_cursor_no_fallback():
+    """A cursor (without the slug) isn't used for every section."""
+    query_dict = QueryDict('cursor=abc')
+    assert (None, None) == section_page(query_dict, 'news')
+
+
+def test_section_page_key():
+    query_dict = QueryDict('news-page=2&events-cursor=abc')
+    assert '2' == section_page_key(query_dict, 'news')
+    assert 'cursor.abc' == section_page_key(query_dict, 'events')
+    assert '' == section_page_key(query_dict, 'body')
+
+
+@pytest.mark.django_db
+def test_section_paginator_count():
+    cache.clear()
+    qs = _pages()
+    paginator = SectionPaginator(qs, 2, (2, 'published'))
+    assert 5 == paginator.count
+    assert 3 == paginator.num_pages
+    PageFactory(order=6)
+    # the count is cached (until the section is published or removed)
+    paginator = SectionPaginator(qs, 2, (2, 'published'))
+    assert 5 == paginator.count
+    paginator = SectionPaginator(qs, 2)
+    assert 6 == paginator.count
@@ -0,0 +1,71 @@
+# -*- encoding: utf-8 -*-
+import pytest
+
+from django.test import override_settings
+
+from block.models import Image
+from block.tasks import rebuild_thumbnails, thumbnails_hash
+from block.tests.factories import ImageFactory
+
+
+@pytest.mark.django_db
+def test_rebuild_thumbnails():
+    i1 = ImageFactory()
+    i2 = ImageFactory()
+    progress = rebuild_thumbnails(workers=0)
+    assert 2 == progress.count
+    assert 0 == progress.skipped
+    assert [] == progress.errors
+    assert i2.pk == progress.last_pk
+    for pk in (i1.pk, i2.pk):
+        image = Image.objects.get(pk=pk)
+        assert thumbnails_hash() == image.thumbnails_hash
+        assert image.thumbnail_url(Image.WIZARD_THUMBNAIL)
+
+
+@pytest.mark.django_db
+def test_rebuild_thumbnails_batch():
+    ImageFactory()
+    ImageFactory()
+    ImageFactory()
+    result = []
+    rebuild_thumbnails(workers=0, batch_size=2, callback=result.append)
+    assert [2, 3] == [x.count for x in result]
+
+
+@pytest.mark.django_db
+def test_rebuild_thumbnails_deleted():
+    ImageFactory(deleted=True)
+    progress = rebuild_thumbnails(workers=0)
+    assert 0 == progress.total
+
+
+@pytest.mark.django_db
+def test_rebuild_thumbnails_force():
+    ImageFactory()
+    rebuild_thumbnails(workers=0)
+    progress = rebuild_thumbnails(workers=0)
+    assert 0 == progress.count
+    assert 1 == progress.skipped
+    progress = rebuild_thumbnails(workers=0, force=True)
+    assert 1 == progress.count
+
+
+@pytest.mark.django_db
+def test_rebuild_thumbnails_settings():
+    """The thumbnails are out of date if the aliases change."""
+    ImageFactory()
+    rebuild_thumbnails(workers=0)
+    aliases = {'': {'200x0': {'size': (200, 0)}}}
+    with override_settings(THUMBNAIL_ALIASES=aliases):
+        progress = rebuild_thumbnails(workers=0)
+    assert 1 == progress.count
+
+
+@pytest.mark.django_db
+def test_rebuild_thumbnails_start_pk():
+    ImageFactory()
+    i2 = ImageFactory()
+    progress = rebuild_thumbnails(workers=0, start_pk=i2.pk)
+    assert 1 == progress.count
+    assert i2.pk == progress.last_pk
@@ -1,7 +1,10 @@
 # -*- encoding: utf-8 -*-
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from block.models import Page
+from block.tasks import refresh_sections_from_template
 from block.tests.factories import (
     PageFactory,
     PageSectionFactory,
@@ -57,3 +60,45 @@ class TestTemplate(TestCase):
             ['b',],
             [p.section.slug for p in page.pagesection_set.all()]
         )
+
+    def _refresh_query_count(self, page_count):
+        section_a = SectionFactory()
+        section_b = SectionFactory()
+        template = TemplateFactory()
+        TemplateSectionFactory(template=template, section=section_b)
+        for order in range(page_count):
+            page = PageFactory(order=order, template=template)
+            PageSectionFactory(page=page, section=section_a)
+        with CaptureQueriesContext(connection) as queries:
+            Page.objects.refresh_sections_from_template(template)
+        for page in Page.objects.filter(template=template):
+            self.assertEqual(
+                [section_b.slug],
+                [p.section.slug for p in page.pagesection_set.all()]
+            )
+        return len(queries)
+
+    def test_update_pages_query_count(self):
+        """The number of queries should not depend on the number of pages."""
+        self.assertEqual(
+            self._refresh_query_count(1), self._refresh_query_count(5)
+        )
+
+    def test_update_pages_background(self):
+        """The sections are updated (by a task) when the transaction commits.
+
+        ``TestCase`` doesn't commit, so the task is not run.
+
+        """
+        template = TemplateFactory()
+        TemplateSectionFactory(template=template)
+        page = PageFactory(template=template)
+        Page.objects.refresh_sections_from_template(template, background=True)
+        self.assertEqual(0, page.pagesection_set.count())
+
+    def test_update_pages_task(self):
+        template = TemplateFactory()
+        TemplateSectionFactory(template=template)
+        page = PageFactory(template=template)
+        refresh_sections_from_template(template.pk)
+        self.assertEqual(1, page.pagesection_set.count())
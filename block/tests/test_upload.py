@@ -0,0 +1,92 @@
+# -*- encoding: utf-8 -*-
+import hashlib
+import io
+import PIL
+import pytest
+
+from django.core.files.uploadhandler import SkipFile
+from django.test import RequestFactory, override_settings
+
+from block.upload import IMAGE_HEADER_SIZE, ContentUploadHandler
+
+
+def _handler(field_name='image'):
+    request = RequestFactory().post('/')
+    handler = ContentUploadHandler(request, image_fields=('image',))
+    handler.new_file(field_name, 'file.png', 'image/png', None)
+    return request, handler
+
+
+def _image_data(size=(3, 2), image_format='png'):
+    fp = io.BytesIO()
+    PIL.Image.new('RGB', size).save(fp, image_format)
+    return fp.getvalue()
+
+
+def _upload(handler, data, chunk_size=16):
+    for start in range(0, len(data), chunk_size):
+        handler.receive_data_chunk(data[start:start + chunk_size], start)
+    return handler.file_complete(len(data))
+
+
+def test_content_hash():
+    data = _image_data()
+    request, handler = _handler()
+    result = _upload(handler, data)
+    assert hashlib.sha256(data).hexdigest() == result.content_hash
+    assert 3 == result.width
+    assert 2 == result.height
+    assert data == result.read()
+    assert {} == request.upload_errors
+
+
+def test_document():
+    data = b'not an image'
+    request, handler = _handler('document')
+    result = _upload(handler, data)
+    assert hashlib.sha256(data).hexdigest() == result.content_hash
+    assert result.width is None
+    assert {} == request.upload_errors
+
+
+@pytest.mark.parametrize('image_format', ['jpeg', 'png'])
+def test_header_split(image_format):
+    """The header is split between several chunks."""
+    data = _image_data(size=(30, 20), image_format=image_format)
+    request, handler = _handler()
+    result = _upload(handler, data, chunk_size=1)
+    assert 30 == result.width
+    assert 20 == result.height
+    assert {} == request.upload_errors
+
+
+@override_settings(BLOCK_UPLOAD_MAX_SIZE=10 * 1024 * 1024)
+def test_header_unknown():
+    """If we can't read the size from the header, the form checks it."""
+    data = b'x' * (IMAGE_HEADER_SIZE + 10)
+    request, handler = _handler()
+    result = _upload(handler, data, chunk_size=64 * 1024)
+    assert result.width is None
+    assert {} == request.upload_errors
+
+
+def test_not_an_image():
+    request, handler = _handler()
+    assert _upload(handler, b'not an image') is None
+    assert 'not an image' in request.upload_errors['image']
+
+
+@override_settings(BLOCK_UPLOAD_MAX_PIXELS=5)
+def test_too_many_pixels():
+    request, handler = _handler()
+    with pytest.raises(SkipFile):
+        _upload(handler, _image_data(), chunk_size=1024)
+    assert '3 x 2 pixels' in request.upload_errors['image']
+
+
+@override_settings(BLOCK_UPLOAD_MAX_SIZE=32)
+def test_too_large():
+    request, handler = _handler()
+    with pytest.raises(SkipFile):
+        _upload(handler, _image_data())
+    assert 'too large' in request.upload_errors['image']
@@ -1,7 +1,12 @@
 # -*- encoding: utf-8 -*-
 import pytest
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from block.models import Link, _url_cache
 from block.tests.factories import (
+    LinkFactory,
     PageFactory,
     UrlFactory,
 )
@@ -31,3 +36,42 @@ def test_url_page_menu():
     PageFactory(slug='sport', slug_menu='football')
     url = UrlFactory(name='project.page', arg1='sport', arg2='football')
     assert '/sport/football/' == url.url
+
+
+@pytest.mark.django_db
+def test_url_cache():
+    _url_cache.clear()
+    url = UrlFactory(name='block.page.list')
+    assert '/block/page/' == url.url
+    assert 1 == len(_url_cache)
+    assert '/block/page/' == url.url
+    assert 1 == len(_url_cache)
+
+
+@pytest.mark.django_db
+def test_url_cache_page_changed():
+    """The page slug is part of the key, so the URL is not out of date."""
+    page = PageFactory(slug='home', slug_menu='')
+    assert '/home/' == page.get_absolute_url()
+    page.slug = 'away'
+    page.save()
+    assert '/away/' == page.get_absolute_url()
+
+
+@pytest.mark.django_db
+def test_url_cache_setting_changed():
+    UrlFactory(name='block.page.list').url
+    assert _url_cache
+    with override_settings(ROOT_URLCONF='example_block.urls'):
+        assert not _url_cache
+
+
+@pytest.mark.django_db
+def test_link_url_no_queries():
+    page = PageFactory(slug='home', slug_menu='')
+    url = UrlFactory(name='project.page', arg1='home', page=page)
+    LinkFactory(link_type=Link.URL_INTERNAL, url_internal=url)
+    link = Link.objects.links().get()
+    with CaptureQueriesContext(connection) as queries:
+        assert '/home/' == link.url
+    assert 0 == len(queries)
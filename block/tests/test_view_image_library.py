@@ -6,6 +6,8 @@ import pytest
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from block.models import (
     BlockError,
@@ -160,3 +162,22 @@ def test_image_update(client):
     image.refresh_from_db()
     assert 'Football' == image.title
     assert ['apple', 'pear'] == sorted([x for x in image.tags.names()])
+
+
+def _category_list_query_count(client, count):
+    for x in range(count):
+        ImageFactory(category=ImageCategoryFactory())
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('block.image.category.list'))
+    assert 200 == response.status_code
+    assert count == len(response.context['categories_in_use'])
+    return len(queries)
+
+
+@pytest.mark.django_db
+def test_category_list_query_count(client):
+    user = UserFactory(is_staff=True)
+    assert client.login(username=user.username, password=TEST_PASSWORD) is True
+    one = _category_list_query_count(client, 1)
+    many = _category_list_query_count(client, 5)
+    assert one == many
@@ -0,0 +1,164 @@
+# -*- encoding: utf-8 -*-
+"""Upload handler for the image and document library.
+
+``ContentUploadHandler`` streams each file to a temporary file (in chunks),
+so a large upload is never held in memory.  In the same pass, it:
+
+- calculates the SHA-256 hash of the content (``content_hash``).
+- reads the image dimensions from the header (``width`` and ``height``).
+- stops writing the file if it is larger than ``BLOCK_UPLOAD_MAX_SIZE``, or
+  if the image has more than ``BLOCK_UPLOAD_MAX_PIXELS``.
+- rejects a (small) file which is not an image.  If the size can't be read
+  from the first ``IMAGE_HEADER_SIZE`` bytes, then the file is checked by
+  the form (as usual).
+
+A rejected file is not added to ``request.FILES``.  The reason is stored in
+``request.upload_errors`` and displayed on the form by ``UploadMixin``.
+
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    SkipFile,
+    TemporaryFileUploadHandler,
+)
+from django.template.defaultfilters import filesizeformat
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image as PILImage
+
+
+# if we can't read the image size from this much data, let the form check it
+IMAGE_HEADER_SIZE = 1024 * 1024
+# 'DecompressionBombError' was added in Pillow 5.0
+DECOMPRESSION_BOMB = (
+    getattr(
+        PILImage,
+        'DecompressionBombError',
+        PILImage.DecompressionBombWarning
+    ),
+    PILImage.DecompressionBombWarning,
+)
+
+
+def upload_max_pixels():
+    return getattr(
+        settings, 'BLOCK_UPLOAD_MAX_PIXELS', PILImage.MAX_IMAGE_PIXELS
+    )
+
+
+def upload_max_size():
+    return getattr(settings, 'BLOCK_UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+
+
+class ContentUploadHandler(TemporaryFileUploadHandler):
+    """Stream the upload to disk, checking the size as we go."""
+
+    def __init__(self, request=None, image_fields=None):
+        super().__init__(request)
+        self.image_fields = image_fields or ()
+        if request is not None and not hasattr(request, 'upload_errors'):
+            request.upload_errors = {}
+
+    def _discard(self, message):
+        # closing the temporary file deletes it
+        self.file.close()
+        if self.request is not None:
+            self.request.upload_errors[self.field_name] = message
+
+    def _reject(self, message):
+        """Stop writing the file (the parser skips the rest of the data)."""
+        self._discard(message)
+        raise SkipFile(message)
+
+    def _check_image(self, raw_data):
+        """Read the size from the header (without decoding the image)."""
+        self.header.extend(raw_data)
+        try:
+            image = PILImage.open(io.BytesIO(bytes(self.header)))
+        except DECOMPRESSION_BOMB:
+            self._reject('The image is too large')
+        except Exception:
+            # not enough data (yet) e.g. a header split between two chunks
+            image = None
+        if image:
+            self.width, self.height = image.size
+            # we have the size, so stop collecting the header
+            self.header = None
+            if self.width * self.height > upload_max_pixels():
+                self._reject(
+                    'The image is too large ({} x {} pixels)'.format(
+                        self.width, self.height
+                    )
+                )
+        elif len(self.header) >= IMAGE_HEADER_SIZE:
+            # the form will check the image
+            self.header = None
+            self.header_skipped = True
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hash = hashlib.sha256()
+        self.header = None
+        self.header_skipped = False
+        self.height = None
+        self.size = 0
+        self.width = None
+        if field_name in self.image_fields:
+            self.header = bytearray()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size = self.size + len(raw_data)
+        if self.size > upload_max_size():
+            self._reject('The file is too large (the maximum is {})'.format(
+                filesizeformat(upload_max_size())
+            ))
+        self.hash.update(raw_data)
+        if self.header is not None:
+            self._check_image(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        image_field = self.field_name in self.image_fields
+        if image_field and self.width is None and not self.header_skipped:
+            # ``SkipFile`` can't be raised here, so don't return the file
+            self._discard('The file is not an image (or is damaged)')
+            return None
+        result = super().file_complete(file_size)
+        result.content_hash = self.hash.hexdigest()
+        result.height = self.height
+        result.width = self.width
+        return result
+
+
+class UploadMixin(object):
+    """Use the ``ContentUploadHandler`` for the view.
+
+    The upload handlers must be changed before the CSRF middleware reads
+    ``request.POST``, so we check the token after changing them.
+
+    .. note:: Put this mixin first (before ``LoginRequiredMixin``).
+
+    """
+
+    upload_image_fields = ()
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        request.upload_handlers = [
+            ContentUploadHandler(request, self.upload_image_fields)
+        ]
+        return csrf_protect(super().dispatch)(request, *args, **kwargs)
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        upload_errors = getattr(self.request, 'upload_errors', {})
+        if form.is_bound and upload_errors:
+            # validate the form (so we can add the errors)
+            form.errors
+            for field_name, message in upload_errors.items():
+                if field_name in form.fields:
+                    form.add_error(field_name, message)
+        return form
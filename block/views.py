@@ -1,4 +1,7 @@
 # -*- encoding: utf-8 -*-
+import hashlib
+import inspect
+
 from django.apps import apps
 from django.contrib import messages
 from django.contrib.auth import REDIRECT_FIELD_NAME
@@ -10,9 +13,11 @@ from django.core.paginator import (
 )
 from django.core.urlresolvers import reverse
 from django.db import transaction
-from django.db.models import Max
+from django.db.models import Max, QuerySet
 from django.http import Http404, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
 from django.utils.text import slugify
 from django.views.generic.base import RedirectView
 from django.views.generic import (
@@ -25,7 +30,22 @@ from django.views.generic import (
     TemplateView,
 )
 
+from block.cache import (
+    page_cache_get,
+    page_cache_key,
+    page_cache_set,
+    page_cache_timeout,
+    page_version,
+)
+from block.metrics import MetricsMixin
+from block.pagination import (
+    SectionPaginator,
+    decode_cursor,
+    keyset_page,
+    section_page,
+)
 from block.tasks import thumbnail_image
+from block.upload import UploadMixin
 from braces.views import (
     LoginRequiredMixin,
     StaffuserRequiredMixin,
@@ -66,6 +86,7 @@ from .forms import (
 )
 from .models import (
     BlockError,
+    ContentManager,
     HeaderFooter,
     Image,
     ImageCategory,
@@ -73,6 +94,7 @@ from .models import (
     LinkCategory,
     Menu,
     MenuItem,
+    ModerateState,
     Page,
     PageSection,
     Section,
@@ -84,6 +106,28 @@ from .models import (
 )
 
 
+def _accepts_cursor(method):
+    """Does the method (which might be overridden) have a ``cursor``?"""
+    return any([
+        x.name == 'cursor' or x.kind == x.VAR_KEYWORD
+        for x in inspect.signature(method).parameters.values()
+    ])
+
+
+def _evaluate(qs):
+    """Run the query for a section (otherwise it runs in the template).
+
+    We only do this when recording metrics, so the time for the section
+    includes the query.
+
+    """
+    if hasattr(qs, 'object_list'):
+        qs.object_list = list(qs.object_list)
+    elif isinstance(qs, QuerySet):
+        # fills the result cache of the queryset
+        len(qs)
+
+
 def _get_block_model(page_section):
     block_model = apps.get_model(
         page_section.section.block_app,
@@ -97,22 +141,118 @@ def _get_block_model(page_section):
     return block_model
 
 
-def _paginate_section(qs, page_no, section):
-    """Paginate the 'block_list' queryset, using page section properties."""
-    if section.paginated:
+def _page_sections(page):
+    """Page sections, with their ``Section`` and ``PaginatedSection``."""
+    return PageSection.objects.filter(
+        page=page,
+    ).select_related(
+        'section',
+        'section__paginated',
+    )
+
+
+def _batched(block_model, method_name):
+    """Can we load the content for several sections in one query?
+
+    Not if the content manager overrides ``method_name`` e.g. ``published``
+    (with a different filter or order) and doesn't override the method for
+    several sections e.g. ``published_sections``.
+
+    """
+    manager = type(block_model.objects)
+    sections_name = '{}_sections'.format(method_name)
+    if not hasattr(manager, sections_name):
+        return False
+    return (
+        getattr(manager, method_name) is getattr(ContentManager, method_name)
+        or getattr(manager, sections_name) is not getattr(
+            ContentManager, sections_name
+        )
+    )
+
+
+def _prefetched(qs, content):
+    """The queryset for a section, using the content which is already loaded.
+
+    Iterating (or counting) the queryset doesn't use the database.  Filtering
+    the queryset runs a new query.
+
+    .. note:: This sets the result cache of the queryset (as Django does for
+              ``prefetch_related``), so ``content`` must be the rows which
+              the queryset would return (see ``_batched``).
+
+    """
+    qs._result_cache = content
+    qs._prefetch_done = True
+    return qs
+
+
+def _section_content(page_sections, method_name, metrics):
+    """Content for the page sections, using one query for each block model.
+
+    ``method_name`` is the content manager method for one section e.g.
+    ``published``.  The content is loaded using the method for several
+    sections e.g. ``published_sections`` (see ``_batched``).  The time for
+    the query is divided between the sections (see ``RequestMetrics``).
+
+    Returns a dictionary of content lists, keyed on the page section ``pk``.
+    A section is not in the dictionary if the content wasn't loaded.
+
+    """
+    block_models = {}
+    for page_section in page_sections:
+        block_model = _get_block_model(page_section)
+        if _batched(block_model, method_name):
+            block_models.setdefault(block_model, []).append(page_section)
+    result = {}
+    for block_model, sections in block_models.items():
+        result.update({page_section.pk: [] for page_section in sections})
+        with metrics.sections([e.section.slug for e in sections]):
+            qs = getattr(block_model.objects, '{}_sections'.format(
+                method_name
+            ))(sections)
+            for c in qs:
+                result[c.block.page_section_id].append(c)
+    return result
+
+
+def _paginate_section(qs, page_no, section, cursor=None, count_key=None):
+    """Paginate the 'block_list' queryset, using page section properties.
+
+    A ``KEYSET`` section uses the ``cursor`` (rather than the ``page_no``).
+    ``count_key`` is used to cache the count (see ``SectionPaginator``).
+
+    """
+    paginated = section.paginated
+    if paginated:
         # this is the block that requires pagination
-        if section.paginated.order_by_field:
-            qs = qs.order_by(section.paginated.order_by_field)
-        if section.paginated.items_per_page:
-            paginator = Paginator(qs, section.paginated.items_per_page)
-        try:
-            qs = paginator.page(page_no)
-        except PageNotAnInteger:
-            # If page is not an integer, deliver first page.
-            qs = paginator.page(1)
-        except EmptyPage:
-            # If page is out of range (e.g. 9999), deliver last page of results
-            qs = paginator.page(paginator.num_pages)
+        if not paginated.items_per_page:
+            # display all of the items
+            if paginated.order_by_field:
+                qs = qs.order_by(paginated.order_by_field)
+        elif paginated.is_keyset:
+            qs = keyset_page(
+                qs,
+                paginated.order_by_field,
+                paginated.items_per_page,
+                cursor,
+                paginated.approximate_count,
+                count_key,
+            )
+        else:
+            if paginated.order_by_field:
+                qs = qs.order_by(paginated.order_by_field)
+            paginator = SectionPaginator(
+                qs, paginated.items_per_page, count_key
+            )
+            try:
+                qs = paginator.page(page_no)
+            except PageNotAnInteger:
+                # If page is not an integer, deliver first page.
+                qs = paginator.page(1)
+            except EmptyPage:
+                # If page is out of range (e.g. 9999), deliver last page
+                qs = paginator.page(paginator.num_pages)
     return qs
 
 
@@ -429,7 +569,7 @@ class PageCreateView(
                 self.object.order = Page.objects.next_order()
             self.object.save()
             self.object.refresh_sections_from_template()
-            Url.objects.init_pages()
+            Url.objects.init_pages(self.object)
         return HttpResponseRedirect(self.get_success_url())
 
     def get_form_class(self):
@@ -475,23 +615,59 @@ class PageTemplateMixin(object):
         return [page.template.template_name, ]
 
 
-class PageDesignMixin(object):
+class PageDesignMixin(MetricsMixin):
+
+    # pending content for the sections which are not paginated (loaded by
+    # ``_create_sections`` using one query for each block model)
+    _pending_content = {}
+
+    def get_section_queryset(self, page_section, page_number, cursor=None):
+        """Pending content for a section.
+
+        The count isn't cached (pending content doesn't change the version
+        of the section).
 
-    def get_section_queryset(self, page_section, page_number):
+        """
         block_model = _get_block_model(page_section)
-        qs = _paginate_section(
-            block_model.objects.pending(page_section),
-            page_number,
-            page_section.section
-        )
+        qs = block_model.objects.pending(page_section)
+        if page_section.pk in self._pending_content:
+            return _prefetched(qs, self._pending_content[page_section.pk])
+        qs = _paginate_section(qs, page_number, page_section.section, cursor)
         return qs
 
     def _create_sections(self, page):
+        """The content for each section is from ``get_section_queryset``.
+
+        The content for the sections which are not paginated is loaded using
+        one query for each block model (see ``_section_content``).
+
+        """
         context = {}
-        for e in PageSection.objects.filter(page=page):
-            qs = self.get_section_queryset(e, self.request.GET.get('page'))
+        with self.metrics.timer('sections'):
+            page_sections = list(_page_sections(page))
+            self._pending_content = _section_content(
+                [e for e in page_sections if not e.section.paginated],
+                'pending',
+                self.metrics,
+            )
+        # an override of ``get_section_queryset`` might not have a cursor
+        accepts_cursor = _accepts_cursor(self.get_section_queryset)
+        for e in page_sections:
+            with self.metrics.section(e.section.slug):
+                page_number, cursor = section_page(
+                    self.request.GET, e.section.slug
+                )
+                if accepts_cursor:
+                    qs = self.get_section_queryset(
+                        e, page_number, cursor=cursor
+                    )
+                else:
+                    qs = self.get_section_queryset(e, page_number)
+                if self.metrics.enabled:
+                    _evaluate(qs)
             context.update({
                 '{}_list'.format(e.section.slug): qs,
+                '{}_page_section'.format(e.section.slug): e,
             })
             create_url = e.section.create_url(page)
             if create_url:
@@ -527,7 +703,7 @@ class PageDesignView(
     pass
 
 
-class PageMixin(object):
+class PageMixin(MetricsMixin):
 
     def _check_url(self, page):
         """Check the page is being accessed using the correct URL.
@@ -556,15 +732,38 @@ class PageMixin(object):
 
     def _create_sections(self, page):
         context = {}
-        for e in PageSection.objects.filter(page=page):
-            block_model = _get_block_model(e)
-            qs = _paginate_section(
-                block_model.objects.published(e),
-                self.request.GET.get('page'),
-                e.section
+        with self.metrics.timer('sections'):
+            page_sections = list(_page_sections(page))
+            content = _section_content(
+                [e for e in page_sections if not e.section.paginated],
+                'published',
+                self.metrics,
             )
+        for e in page_sections:
+            with self.metrics.section(e.section.slug):
+                block_model = _get_block_model(e)
+                if e.section.paginated:
+                    page_number, cursor = section_page(
+                        self.request.GET, e.section.slug
+                    )
+                    qs = _paginate_section(
+                        block_model.objects.published(e),
+                        page_number,
+                        e.section,
+                        cursor,
+                        (e.pk, ModerateState.PUBLISHED, e.version),
+                    )
+                    if self.metrics.enabled:
+                        _evaluate(qs)
+                elif e.pk in content:
+                    qs = _prefetched(
+                        block_model.objects.published(e), content[e.pk]
+                    )
+                else:
+                    qs = block_model.objects.published(e)
             context.update({
                 '{}_list'.format(e.section.slug): qs,
+                '{}_page_section'.format(e.section.slug): e,
             })
         return context
 
@@ -586,6 +785,136 @@ class PageMixin(object):
         return context
 
 
+class PageCacheMixin(object):
+    """Cache the rendered page for anonymous users.
+
+    The page cache is disabled unless ``BLOCK_PAGE_CACHE_TIMEOUT`` is set.
+    The cache key is built from the URL, so a cached page is returned without
+    using the database.  For cache invalidation, see ``block/cache.py``.
+
+    When the page cache is enabled, pages for anonymous users have an
+    ``ETag`` and ``Last-Modified`` header, so browsers can revalidate the
+    page.  The ``ETag`` includes the content version of the page (from the
+    database) and the cache generations (``page_version``), so a ``304``
+    response uses one query (and a cached page, which has the headers, uses
+    none).
+
+    Custom pages (which usually have a form) are not cached.
+
+    """
+
+    page_cache_allowed = False
+
+    def _cacheable(self, response):
+        return (
+            self.page_cache_allowed and
+            response.status_code == 200 and
+            not response.cookies and
+            not self.request.META.get('CSRF_COOKIE_USED') and
+            not len(messages.get_messages(self.request))
+        )
+
+    def _page_version(self):
+        """The ``ETag`` and last modified time (seconds) for the page."""
+        request = self.request
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        # the generations must be shared by all of the processes
+        if not page_cache_timeout() or request.user.is_authenticated:
+            return None
+        slug = self.kwargs.get('page', '')
+        slug_menu = self.kwargs.get('menu', '')
+        content_version = Page.objects.version(slug, slug_menu)
+        if content_version is None:
+            return None
+        version, modified = page_version(slug, slug_menu)
+        value = '{}.{}.{}'.format(
+            content_version, version, urlencode(sorted(request.GET.items()))
+        )
+        etag = quote_etag(hashlib.md5(value.encode('utf-8')).hexdigest())
+        return etag, modified
+
+    def _set_version(self, response, etag, modified):
+        response['ETag'] = etag
+        if modified:
+            response['Last-Modified'] = http_date(modified)
+
+    def _page_cache_key(self):
+        request = self.request
+        if not page_cache_timeout() or request.user.is_authenticated:
+            return None
+        # only cache the page for pagination parameters
+        for name, value in request.GET.items():
+            if name == 'page' or name.endswith('-page'):
+                if not value.isdigit():
+                    return None
+            elif name == 'cursor' or name.endswith('-cursor'):
+                if decode_cursor(value) is None:
+                    return None
+            else:
+                return None
+        return page_cache_key(
+            self.kwargs.get('page', ''),
+            self.kwargs.get('menu', ''),
+            urlencode(sorted(request.GET.items())),
+        )
+
+    def _page_cache_set(self, key, response):
+        if self._cacheable(response):
+            page_cache_set(key, response)
+
+    def _page_version_set(self, version, response):
+        if self._cacheable(response):
+            self._set_version(response, *version)
+
+    def get(self, request, *args, **kwargs):
+        version = None
+        conditional = (
+            'HTTP_IF_MODIFIED_SINCE' in request.META or
+            'HTTP_IF_NONE_MATCH' in request.META
+        )
+        if conditional:
+            version = self._page_version()
+        if version:
+            etag, modified = version
+            # we only send an 'ETag' for pages which can be cached
+            response = get_conditional_response(
+                request, etag=etag, last_modified=modified
+            )
+            if response is not None:
+                self._set_version(response, etag, modified)
+                return response
+        key = self._page_cache_key()
+        if key:
+            response = page_cache_get(key)
+            if response is not None:
+                self.metrics.cache_hit('page')
+                return response
+            self.metrics.cache_miss('page')
+        if not conditional:
+            version = self._page_version()
+        response = super().get(request, *args, **kwargs)
+        if hasattr(response, 'add_post_render_callback'):
+            # set the version before the response is cached
+            if version:
+                response.add_post_render_callback(
+                    lambda r: self._page_version_set(version, r)
+                )
+            if key:
+                response.add_post_render_callback(
+                    lambda r: self._page_cache_set(key, r)
+                )
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context['page']
+        self.page_cache_allowed = not (
+            page.is_custom or page.slug == Page.CUSTOM
+        )
+        return context
+
+
 class PageFormMixin(PageMixin, PageTemplateMixin, ContentPageMixin):
     pass
 
@@ -594,7 +923,7 @@ class PageDetailView(PageFormMixin, DetailView):
     pass
 
 
-class PageTemplateView(PageFormMixin, TemplateView):
+class PageTemplateView(PageCacheMixin, PageFormMixin, TemplateView):
     pass
 
 
@@ -613,19 +942,20 @@ class PageUpdateView(
         with transaction.atomic():
             self.object = form.save()
             self.object.refresh_sections_from_template()
-            Url.objects.init_pages()
+            Url.objects.init_pages(self.object)
         return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
         return reverse('block.page.list')
 
 
-class CmsMixin(object):
+class CmsMixin(MetricsMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context.update(dict(
             header_footer=HeaderFooter.load(),
+            main_menu=Menu.objects.menu_tree(Menu.NAVIGATION),
             main_menu_item_list=Menu.objects.navigation_menu_items()
         ))
         return context
@@ -743,7 +1073,7 @@ class TemplateUpdateView(
         return reverse('block.template.list')
 
 
-class WizardMixin:
+class WizardMixin(MetricsMixin):
 
     def _content_obj(self):
         content_type_pk = self.kwargs['content']
@@ -1210,11 +1540,12 @@ class WizardImageSelect(
 
 
 class WizardImageUpload(
-        LoginRequiredMixin, StaffuserRequiredMixin, WizardImageMixin,
-        CreateView):
+        UploadMixin, LoginRequiredMixin, StaffuserRequiredMixin,
+        WizardImageMixin, CreateView):
 
     form_class = ImageForm
     template_name = 'block/wizard_image_upload.html'
+    upload_image_fields = ('image',)
 
     def form_valid(self, form):
         content_obj = self._content_obj()
@@ -1440,8 +1771,8 @@ class WizardLinkRemove(
 
 
 class WizardLinkUpload(
-        LoginRequiredMixin, StaffuserRequiredMixin, WizardLinkMixin,
-        CreateView):
+        UploadMixin, LoginRequiredMixin, StaffuserRequiredMixin,
+        WizardLinkMixin, CreateView):
     """ Upload a document and link to it """
 
     form_class = DocumentForm
@@ -1473,12 +1804,13 @@ class ImageMaintenanceMixin(object):
 
 
 class ImageCreateView(
-        LoginRequiredMixin, StaffuserRequiredMixin, ImageMaintenanceMixin,
-        CreateView):
+        UploadMixin, LoginRequiredMixin, StaffuserRequiredMixin,
+        ImageMaintenanceMixin, CreateView):
 
     form_class = ImageForm
     template_name = 'block/wizard_image_upload.html'
     model = Image
+    upload_image_fields = ('image',)
 
     def form_valid(self, form):
         with transaction.atomic():
@@ -1499,8 +1831,15 @@ class ImageCreateView(
 
 class ImageListView(LoginRequiredMixin, StaffuserRequiredMixin, ListView):
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(dict(images_in_use=Image.objects.images_in_use(
+            [image.pk for image in context['object_list']]
+        )))
+        return context
+
     def get_queryset(self):
-        return Image.objects.images()
+        return Image.objects.images().prefetch_related('tags')
 
 
 class ImageListDeleteView(
@@ -1515,6 +1854,16 @@ class ImageListDeleteView(
     form_class = ImageListDeleteForm
     template_name = 'block/image_list_delete.html'
 
+    def get_context_data(self, **kwargs):
+        """Warn the user about images which are used on a page."""
+        context = super().get_context_data(**kwargs)
+        images = list(Image.objects.images())
+        in_use = Image.objects.images_in_use([image.pk for image in images])
+        context.update(dict(
+            images_in_use=[image for image in images if image.pk in in_use],
+        ))
+        return context
+
     def form_valid(self, form):
         images = form.cleaned_data['images']
         for image in images:
@@ -1571,6 +1920,15 @@ class ImageCategoryListView(
 
     model = ImageCategory
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(dict(
+            categories_in_use=ImageCategory.objects.categories_in_use(
+                [category.pk for category in context['object_list']]
+            ),
+        ))
+        return context
+
     def get_queryset(self):
         return ImageCategory.objects.categories()
 
@@ -1637,6 +1995,12 @@ class LinkCategoryUpdateView(
 
 class LinkListView(LoginRequiredMixin, StaffuserRequiredMixin, ListView):
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # the template displays the pages where each link is used
+        Link.objects.prefetch_usage(context['object_list'])
+        return context
+
     def get_queryset(self):
         return Link.objects.links()
 
@@ -1650,8 +2014,8 @@ class LinkUpdateMixin(object):
 
 
 class LinkDocumentCreateView(
-        LoginRequiredMixin, StaffuserRequiredMixin, LinkUpdateMixin,
-        CreateView):
+        UploadMixin, LoginRequiredMixin, StaffuserRequiredMixin,
+        LinkUpdateMixin, CreateView):
     """ Upload a document and link to it """
 
     form_class = DocumentForm
@@ -1672,8 +2036,8 @@ class LinkDocumentCreateView(
 
 
 class LinkDocumentUpdateView(
-        LoginRequiredMixin, StaffuserRequiredMixin, LinkUpdateMixin,
-        UpdateView):
+        UploadMixin, LoginRequiredMixin, StaffuserRequiredMixin,
+        LinkUpdateMixin, UpdateView):
 
     """ Update a document link
 
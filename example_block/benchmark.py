@@ -0,0 +1,159 @@
+# -*- encoding: utf-8 -*-
+"""Create a large amount of content (quickly) for the benchmarks.
+
+The rows are created directly (rather than using the test factories), so
+the management commands don't depend on the tests.
+
+"""
+import io
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from block.models import (
+    Image,
+    Link,
+    ModerateState,
+    Page,
+    PageSection,
+    Section,
+    Template,
+    publish_many,
+)
+from example_block.models import Title, TitleBlock, TitleImage
+
+
+SECTION_TEMPLATE = (
+    "{{% include 'example/_benchmark_section.html' "
+    "with content_list={}_list %}}"
+)
+
+
+def _image(count):
+    """An image with a different colour (so the content is different)."""
+    fp = io.BytesIO()
+    PILImage.new(
+        'RGB', (64, 48), (count % 256, count // 256 % 256, 128)
+    ).save(fp, 'png')
+    image = Image(
+        title='Image {}'.format(count),
+        image=ContentFile(fp.getvalue(), name='benchmark.png'),
+    )
+    image.save()
+    return image
+
+
+def _page(prefix, template_name):
+    template = Template.objects.init_template(prefix, template_name)
+    return Page.objects.create_page(prefix, '', prefix, 0, template)
+
+
+def make_content(rows, blocks_per_section=100, prefix='benchmark'):
+    """Create ``rows`` of published ``Title`` content.
+
+    The content is spread across page sections (``blocks_per_section`` in
+    each).  Returns a list of the page sections.
+
+    """
+    page = _page(prefix, 'example/page.html')
+    section_count = max(1, -(-rows // blocks_per_section))
+    Section.objects.bulk_create([
+        Section(
+            name='{} {}'.format(prefix, count),
+            slug='{}-{}'.format(prefix, count),
+            block_app='example_block',
+            block_model='Title',
+        )
+        for count in range(section_count)
+    ])
+    sections = Section.objects.filter(slug__startswith='{}-'.format(prefix))
+    PageSection.objects.bulk_create([
+        PageSection(page=page, section=section) for section in sections
+    ])
+    page_sections = list(page.pagesection_set.order_by('pk'))
+    TitleBlock.objects.bulk_create([
+        TitleBlock(page_section=page_sections[count // blocks_per_section])
+        for count in range(rows)
+    ])
+    blocks = TitleBlock.objects.filter(
+        page_section__page=page
+    ).order_by('pk')
+    now = timezone.now()
+    values = Title._moderate_values(ModerateState.PUBLISHED)
+    batch = []
+    for count, block in enumerate(blocks.iterator()):
+        batch.append(Title(
+            block=block,
+            date_moderated=now,
+            order=rows - count,
+            title='{} {}'.format(prefix, count),
+            **values
+        ))
+        if len(batch) == 1000:
+            Title.objects.bulk_create(batch)
+            batch = []
+    Title.objects.bulk_create(batch)
+    return page_sections
+
+
+def make_library(images, links):
+    """Images and links for the library (and wizard) views."""
+    for count in range(images):
+        _image(count)
+    for count in range(links):
+        Link.objects.create_external_link(
+            'https://www.example.com/{}'.format(count),
+            'Link {}'.format(count),
+        )
+
+
+def make_page(sections, blocks, images, user, prefix='benchmark'):
+    """A page with ``sections`` x ``blocks`` x ``images`` (slideshow).
+
+    The content is published.  Returns the page and the folder containing
+    the page template (``page_template``), which renders every section.
+
+    """
+    folder = tempfile.mkdtemp()
+    page = _page(prefix, '{}/page.html'.format(prefix))
+    slugs = []
+    titles = []
+    image_count = 0
+    for section_count in range(sections):
+        # the slug is used in the template, so it can't contain a '-'
+        slug = '{}_{}'.format(prefix, section_count)
+        slugs.append(slug)
+        section = Section.objects.create_section(
+            slug, slug, 'example_block', 'Title', ''
+        )
+        page_section = PageSection.objects.create_page_section(page, section)
+        for block_count in range(blocks):
+            title = Title.objects.create(
+                block=TitleBlock.objects.create(page_section=page_section),
+                order=block_count,
+                title='{} {}'.format(prefix, block_count),
+            )
+            titles.append(title)
+            for order in range(images):
+                TitleImage.objects.create(
+                    content=title, image=_image(image_count), order=order
+                )
+                image_count = image_count + 1
+    publish_many([title.block for title in titles], user)
+    page_template(folder, prefix, slugs)
+    return page, folder
+
+
+def page_template(folder, prefix, slugs):
+    """Write a page template which renders each section."""
+    file_name = os.path.join(folder, prefix, 'page.html')
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    with open(file_name, 'w') as f:
+        f.write("{% extends 'dash/base.html' %}\n")
+        f.write('{% block content %}\n')
+        for slug in slugs:
+            f.write(SECTION_TEMPLATE.format(slug) + '\n')
+        f.write('{% endblock content %}\n')
@@ -0,0 +1,201 @@
+# -*- encoding: utf-8 -*-
+import copy
+import json
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from block.models import EditState, ModerateState, Wizard
+from example_block.benchmark import make_library, make_page
+from example_block.models import Title
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Measure queries and time for the page, design, publish, wizard "
+        "and library views (the data is rolled back).  To benchmark "
+        "PostgreSQL, run with '--settings' for a PostgreSQL database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sections', type=int, default=5)
+        parser.add_argument('--blocks', type=int, default=10)
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=3,
+            help='Slideshow images for each block',
+        )
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument(
+            '--output',
+            help='Write the results to this (JSON) file',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Compare the results with an earlier (JSON) file',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Allowed increase in time e.g. 0.25 for 25%%',
+        )
+
+    def _measure(self, func, repeat, before=None):
+        """Returns the number of queries and the median time (ms)."""
+        # warm up e.g. the state and content type caches
+        if before:
+            before()
+        func()
+        timings = []
+        for count in range(repeat):
+            if before:
+                before()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.time()
+                func()
+                timings.append((time.time() - start) * 1000)
+        return {
+            'queries': len(queries),
+            'ms': round(statistics.median(timings), 2),
+        }
+
+    def _get(self, client, url):
+        def _func():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(
+                    "'{}' returned {}".format(url, response.status_code)
+                )
+        return _func
+
+    def _benchmark(self, options):
+        user = get_user_model().objects.create_user(
+            username='benchmark', is_staff=True
+        )
+        # the images (and thumbnails) are saved to a temporary folder (the
+        # database is rolled back, but the files would be left behind)
+        media_root = tempfile.mkdtemp()
+        folder = None
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                page, folder = make_page(
+                    options['sections'],
+                    options['blocks'],
+                    options['images'],
+                    user,
+                )
+                # the page template (which renders every section) is in
+                # 'folder'
+                templates = copy.deepcopy(settings.TEMPLATES)
+                templates[0]['DIRS'] = list(templates[0]['DIRS']) + [folder]
+                with override_settings(TEMPLATES=templates):
+                    return self._views(page, user, options)
+        finally:
+            if folder:
+                shutil.rmtree(folder)
+            shutil.rmtree(media_root)
+
+    def _views(self, page, user, options):
+        make_library(options['images'] * 10, options['images'] * 10)
+        pending = Title.objects.filter(
+            block__page_section__page=page,
+            **Title._moderate_filter(ModerateState.PENDING)
+        )
+        content = pending.first()
+        anonymous = Client()
+        staff = Client()
+        staff.force_login(user)
+        repeat = options['repeat']
+
+        def _edit():
+            pending.update(edit_state=EditState.objects._edit())
+
+        return {
+            'page': self._measure(
+                self._get(anonymous, page.get_absolute_url()), repeat
+            ),
+            'page_design': self._measure(
+                self._get(staff, page.get_design_url()), repeat
+            ),
+            'publish': self._measure(
+                lambda: page.publish(user), repeat, before=_edit
+            ),
+            'wizard_image': self._measure(
+                self._get(staff, content._wizard_url(
+                    'block.wizard.image.choose', 'slideshow', Wizard.MULTI
+                )),
+                repeat,
+            ),
+            'wizard_link': self._measure(
+                self._get(staff, content._wizard_url(
+                    'block.wizard.link.choose', 'references', Wizard.MULTI
+                )),
+                repeat,
+            ),
+            'image_list': self._measure(
+                self._get(staff, reverse('block.image.list')), repeat
+            ),
+            'link_list': self._measure(
+                self._get(staff, reverse('block.link.list')), repeat
+            ),
+        }
+
+    def _compare(self, file_name, results, threshold):
+        with open(file_name) as f:
+            baseline = json.load(f)['results']
+        failed = []
+        for name, result in sorted(results.items()):
+            before = baseline.get(name)
+            if not before:
+                continue
+            self.stdout.write('{:<15} queries {} -> {}, {}ms -> {}ms'.format(
+                name,
+                before['queries'],
+                result['queries'],
+                before['ms'],
+                result['ms'],
+            ))
+            if result['queries'] > before['queries']:
+                failed.append('{} (queries)'.format(name))
+            if result['ms'] > before['ms'] * (1 + threshold):
+                failed.append('{} (time)'.format(name))
+        if failed:
+            raise CommandError(
+                'Slower than {}: {}'.format(file_name, ', '.join(failed))
+            )
+
+    def handle(self, *args, **options):
+        parameters = {
+            key: options[key]
+            for key in ('sections', 'blocks', 'images', 'repeat')
+        }
+        with override_settings(
+                ALLOWED_HOSTS=['testserver'], BLOCK_PAGE_CACHE_TIMEOUT=0):
+            with transaction.atomic():
+                results = self._benchmark(options)
+                transaction.set_rollback(True)
+        for name, result in sorted(results.items()):
+            self.stdout.write('{:<15} {:>5} queries {:>10.2f}ms'.format(
+                name, result['queries'], result['ms']
+            ))
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'database': connection.vendor,
+                    'parameters': parameters,
+                    'results': results,
+                }, f, indent=4, sort_keys=True)
+        if options['compare']:
+            self._compare(options['compare'], results, options['threshold'])
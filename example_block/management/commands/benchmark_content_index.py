@@ -0,0 +1,92 @@
+# -*- encoding: utf-8 -*-
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from example_block.benchmark import make_content
+from example_block.models import Title
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Compare the query plan for content with and without the "
+        "'content_indexes' (the data is rolled back).  Not for MySQL "
+        "(dropping an index can't be rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=100000,
+            help='Number of rows in the content table',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Run each query this number of times',
+        )
+
+    def _analyze(self):
+        """Update the statistics, so the planner knows about the new rows."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(Title._meta.db_table))
+
+    def _explain(self, qs):
+        sql, params = qs.query.sql_with_params()
+        if connection.vendor == 'postgresql':
+            prefix = 'EXPLAIN ANALYZE'
+        elif connection.vendor == 'sqlite':
+            prefix = 'EXPLAIN QUERY PLAN'
+        else:
+            prefix = 'EXPLAIN'
+        with connection.cursor() as cursor:
+            cursor.execute('{} {}'.format(prefix, sql), params)
+            return [
+                ' '.join([str(x) for x in row]) for row in cursor.fetchall()
+            ]
+
+    def _milliseconds(self, qs, repeat):
+        start = time.time()
+        for count in range(repeat):
+            list(qs)
+        return (time.time() - start) * 1000 / repeat
+
+    def _report(self, caption, page_section, repeat):
+        self.stdout.write(caption)
+        queries = [
+            ('pending', Title.objects.pending(page_section)),
+            ('published', Title.objects.published(page_section)),
+        ]
+        for name, qs in queries:
+            self.stdout.write('  {}: {:.2f}ms'.format(
+                name, self._milliseconds(qs, repeat)
+            ))
+            for line in self._explain(qs):
+                self.stdout.write('    {}'.format(line))
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'mysql':
+            # MySQL commits the transaction before changing the schema
+            raise CommandError(
+                "Cannot roll back 'DROP INDEX' on MySQL, so the benchmark "
+                "would delete the index"
+            )
+        rows = options['rows']
+        repeat = options['repeat']
+        self.stdout.write('Creating {} rows of content...'.format(rows))
+        with transaction.atomic():
+            page_sections = make_content(rows)
+            page_section = page_sections[len(page_sections) // 2]
+            self._analyze()
+            self._report('With index', page_section, repeat)
+            with connection.schema_editor() as schema_editor:
+                for index in Title._meta.indexes:
+                    schema_editor.remove_index(Title, index)
+            self._analyze()
+            self._report('Without index', page_section, repeat)
+            transaction.set_rollback(True)
+        self.stdout.write('Rolled back the benchmark data')
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from block.models import populate_moderate_code
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('block', '0018_image_user'),
+        ('example_block', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='moderate_code',
+            field=models.PositiveSmallIntegerField(db_index=True, default=1),
+        ),
+        migrations.RunPython(
+            populate_moderate_code('example_block', 'Title'),
+            migrations.RunPython.noop,
+        ),
+        migrations.AddIndex(
+            model_name='title',
+            index=models.Index(fields=['block', 'moderate_code', 'order'], name='example_title_block_code_idx'),
+        ),
+    ]
@@ -9,7 +9,9 @@ from block.models import (
     ContentModel,
     Image,
     Link,
+    ModerateCodeMixin,
     Wizard,
+    content_indexes,
 )
 
 
@@ -19,7 +21,7 @@ class TitleBlock(BlockModel):
 reversion.register(TitleBlock)
 
 
-class Title(ContentModel):
+class Title(ModerateCodeMixin, ContentModel):
 
     block = models.ForeignKey(TitleBlock, related_name='content')
     order = models.IntegerField()
@@ -45,10 +47,15 @@ class Title(ContentModel):
         through='TitleLink'
     )
 
+    ordered_relations = ('slideshow', 'references')
+
     class Meta:
         # cannot put 'unique_together' on abstract base class
         # https://code.djangoproject.com/ticket/16732
         unique_together = ('block', 'moderate_state')
+        indexes = content_indexes(
+            'example_title_block_code_idx', 'moderate_code'
+        )
         verbose_name = 'Test content'
         verbose_name_plural = 'Test contents'
 
@@ -57,28 +64,22 @@ class Title(ContentModel):
             self.title, self.order, self.moderate_state.name
         )
 
-    def copy_related_data(self, published_instance):
-        """Copy slideshow images and links for the references."""
-        for item in self.ordered_slideshow():
-            obj = self.slideshow.through(
-                content=published_instance,
-                image=item.image,
-                order=item.order,
-            )
-            obj.save()
-        for item in self.ordered_references():
-            obj = self.references.through(
-                content=published_instance,
-                link=item.link,
-                order=item.order,
-            )
-            obj.save()
-
     def ordered_references(self):
-        return self.references.through.objects.filter(content=self)
+        return self.references.through.objects.filter(
+            content=self
+        ).select_related(
+            'link',
+            'link__document',
+            'link__url_internal',
+            'link__url_internal__page',
+        )
 
     def ordered_slideshow(self):
-        return self.slideshow.through.objects.filter(content=self)
+        return self.slideshow.through.objects.filter(
+            content=self
+        ).select_related(
+            'image',
+        )
 
     def url_publish(self):
         return reverse('example.title.publish', kwargs={'pk': self.pk})
@@ -1,7 +1,12 @@
 # -*- encoding: utf-8 -*-
 import factory
 
-from block.tests.factories import PageSectionFactory
+from block.tests.factories import (
+    PageFactory,
+    PageSectionFactory,
+    SectionFactory,
+    TemplateFactory,
+)
 from example_block.models import (
     Title,
     TitleBlock,
@@ -40,3 +45,18 @@ class TitleLinkFactory(factory.django.DjangoModelFactory):
 
     class Meta:
         model = TitleLink
+
+
+def title_page_section():
+    """A ``body`` section for ``Title`` content on an example page."""
+    return PageSectionFactory(
+        page=PageFactory(
+            slug_menu='',
+            template=TemplateFactory(template_name='example/page.html'),
+        ),
+        section=SectionFactory(
+            slug='body',
+            block_app='example_block',
+            block_model='Title',
+        ),
+    )
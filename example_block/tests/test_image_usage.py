@@ -0,0 +1,27 @@
+# -*- encoding: utf-8 -*-
+import pytest
+
+from block.models import Image
+from block.tests.factories import ImageFactory
+from example_block.tests.factories import TitleFactory, TitleImageFactory
+from login.tests.factories import UserFactory
+
+
+@pytest.mark.django_db
+def test_images_in_use():
+    image_1 = ImageFactory()
+    image_2 = ImageFactory()
+    image_3 = ImageFactory()
+    TitleFactory(picture=image_1)
+    TitleImageFactory(content=TitleFactory(), image=image_3, order=1)
+    assert {image_1.pk, image_3.pk} == Image.objects.images_in_use(
+        [image_1.pk, image_2.pk, image_3.pk]
+    )
+
+
+@pytest.mark.django_db
+def test_images_in_use_removed():
+    image = ImageFactory()
+    title = TitleFactory(picture=image)
+    title.block.remove(UserFactory())
+    assert set() == Image.objects.images_in_use([image.pk])
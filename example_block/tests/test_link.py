@@ -1,8 +1,13 @@
 # -*- encoding: utf-8 -*-
 import pytest
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from block.models import Link
-from block.tests.factories import LinkFactory
+from block.tests.factories import LinkFactory, PageFactory
+from example_block.tests.factories import TitleFactory, TitleLinkFactory
+from login.tests.factories import UserFactory
 
 
 @pytest.mark.django_db
@@ -28,3 +33,55 @@ def test_open_in_tab_external():
 def test_open_in_tab_internal():
     link = LinkFactory(link_type=Link.URL_INTERNAL)
     assert link.open_in_tab is False
+
+
+@pytest.mark.django_db
+def test_blocks_used():
+    link = LinkFactory()
+    title = TitleFactory(link=link)
+    assert [title] == link.blocks_used
+    assert link.in_use is True
+
+
+@pytest.mark.django_db
+def test_blocks_used_references():
+    """The link is used in a many to many field (through ``TitleLink``)."""
+    link = LinkFactory()
+    title = TitleFactory(block__page_section__page=PageFactory(name='Apple'))
+    TitleLinkFactory(content=title, link=link, order=1)
+    assert [title] == link.blocks_used
+    assert ['Apple'] == [page.name for page in link.pages_used]
+
+
+@pytest.mark.django_db
+def test_blocks_used_removed():
+    link = LinkFactory()
+    title = TitleFactory(link=link)
+    title.block.remove(UserFactory())
+    assert [] == link.blocks_used
+    assert link.in_use is False
+
+
+@pytest.mark.django_db
+def test_links_in_use():
+    link_1 = LinkFactory()
+    link_2 = LinkFactory()
+    link_3 = LinkFactory()
+    TitleFactory(link=link_1)
+    TitleLinkFactory(content=TitleFactory(), link=link_3, order=1)
+    assert {link_1.pk, link_3.pk} == Link.objects.links_in_use(
+        [link_1.pk, link_2.pk, link_3.pk]
+    )
+
+
+@pytest.mark.django_db
+def test_prefetch_usage():
+    """The query count does not depend on the number of links."""
+    for count in range(5):
+        TitleFactory(link=LinkFactory())
+    links = Link.objects.prefetch_usage(Link.objects.links())
+    with CaptureQueriesContext(connection) as queries:
+        for link in links:
+            assert link.in_use is True
+            assert 1 == len(link.pages_used)
+    assert 0 == len(queries)
@@ -1,10 +1,19 @@
 # -*- encoding: utf-8 -*-
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.six import StringIO
 
 from block.management.commands import demo_data_block
 from login.management.commands import demo_data_login
 
+from example_block.benchmark import page_template
 from example_block.management.commands import demo_data_example
+from example_block.models import Title
 
 
 class TestCommand(TestCase):
@@ -17,3 +26,39 @@ class TestCommand(TestCase):
         pre.handle()
         command = demo_data_example.Command()
         command.handle()
+
+    def test_benchmark_content_index(self):
+        out = StringIO()
+        call_command('benchmark_content_index', rows=250, repeat=1, stdout=out)
+        self.assertIn('Without index', out.getvalue())
+        self.assertEqual(0, Title.objects.count())
+
+    def test_benchmark_block(self):
+        file_name = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+        media_root = tempfile.mkdtemp()
+        with override_settings(MEDIA_ROOT=media_root):
+            call_command(
+                'benchmark_block',
+                sections=1,
+                blocks=2,
+                images=1,
+                repeat=1,
+                output=file_name,
+                stdout=StringIO(),
+            )
+        with open(file_name) as f:
+            data = json.load(f)
+        self.assertIn('page', data['results'])
+        self.assertIn('publish', data['results'])
+        self.assertEqual(0, Title.objects.count())
+        # the images are not left in the media folder
+        self.assertEqual([], os.listdir(media_root))
+
+    def test_benchmark_page_template(self):
+        """The page template renders every benchmark section."""
+        folder = tempfile.mkdtemp()
+        page_template(folder, 'benchmark', ['benchmark_0', 'benchmark_1'])
+        with open(os.path.join(folder, 'benchmark', 'page.html')) as f:
+            content = f.read()
+        self.assertIn('content_list=benchmark_0_list', content)
+        self.assertIn('content_list=benchmark_1_list', content)
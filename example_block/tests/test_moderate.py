@@ -1,7 +1,8 @@
 # -*- encoding: utf-8 -*-
 import pytest
 
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 
 from block.models import (
     BlockError,
@@ -132,6 +133,71 @@ def test_publish():
     assert [1, 2] == [item.order for item in obj.ordered_references()]
 
 
+@pytest.mark.django_db
+def test_publish_ordered_relations_query_count():
+    """One insert for each relation (not one for each row)."""
+    user = UserFactory()
+    counts = []
+    for image_count in (1, 10):
+        title = TitleFactory()
+        for order in range(image_count):
+            TitleImageFactory(content=title, image=ImageFactory(), order=order)
+        TitleLinkFactory(content=title, link=LinkFactory(), order=1)
+        with CaptureQueriesContext(connection) as queries:
+            title.block.publish(user)
+        counts.append(len(queries))
+        published = title.block.get_published()
+        assert image_count == published.ordered_slideshow().count()
+        assert 1 == published.ordered_references().count()
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.django_db
+def test_moderate_code():
+    block = TitleBlockFactory()
+    title = TitleFactory(block=block)
+    assert ModerateState.CODES[ModerateState.PENDING] == title.moderate_code
+    block.publish(UserFactory())
+    published = block.get_published()
+    assert ModerateState.CODES[ModerateState.PUBLISHED] == (
+        published.moderate_code
+    )
+    block.remove(UserFactory())
+    published.refresh_from_db()
+    assert ModerateState.CODES[ModerateState.REMOVED] == (
+        published.moderate_code
+    )
+
+
+@pytest.mark.django_db
+def test_moderate_code_create_published():
+    """The code is set when the state is set directly."""
+    title = TitleFactory(moderate_state=ModerateState.objects._published())
+    title.refresh_from_db()
+    assert ModerateState.CODES[ModerateState.PUBLISHED] == title.moderate_code
+    assert title.is_published is True
+    page_section = title.block.page_section
+    assert [title] == list(Title.objects.published(page_section))
+    title.moderate_state = ModerateState.objects._removed()
+    title.save()
+    title.refresh_from_db()
+    assert title.is_removed is True
+
+
+@pytest.mark.django_db
+def test_moderate_code_no_lookup():
+    """Filter and check the state without the moderate state table."""
+    title = TitleFactory()
+    title.block.publish(UserFactory())
+    page_section = title.block.page_section
+    ModerateState.objects.clear_cache()
+    with CaptureQueriesContext(connection) as queries:
+        result = list(Title.objects.published(page_section))
+        assert [True] == [obj.is_published for obj in result]
+    assert 1 == len(queries)
+    assert 'block_moderatestate' not in queries[0]['sql']
+
+
 @pytest.mark.django_db
 def test_remove_already():
     """content has already been removed and cannot be removed again."""
@@ -0,0 +1,97 @@
+# -*- encoding: utf-8 -*-
+import pytest
+
+from block.models import Page, PageSection, publish_many
+from block.tests.factories import (
+    PageFactory,
+    PageSectionFactory,
+    SectionFactory,
+    TemplateFactory,
+    TemplateSectionFactory,
+)
+from example_block.tests.factories import TitleFactory
+from login.tests.factories import UserFactory
+
+
+def _versions(page_section):
+    page = page_section.page
+    return (
+        Page.objects.version(page.slug, page.slug_menu),
+        PageSection.objects.version(page_section.pk),
+    )
+
+
+@pytest.mark.django_db
+def test_version():
+    page_section = PageSectionFactory()
+    assert (1, 1) == _versions(page_section)
+
+
+@pytest.mark.django_db
+def test_version_does_not_exist():
+    assert Page.objects.version('does-not-exist') is None
+    assert PageSection.objects.version(999) is None
+
+
+@pytest.mark.django_db
+def test_version_design():
+    """Creating and editing pending content updates the version."""
+    page_section = PageSectionFactory()
+    c = TitleFactory(block__page_section=page_section)
+    assert (2, 2) == _versions(page_section)
+    c.title = 'Apple'
+    c.set_pending_edit()
+    c.save()
+    assert (3, 3) == _versions(page_section)
+
+
+@pytest.mark.django_db
+def test_version_publish():
+    page_section = PageSectionFactory()
+    c = TitleFactory(block__page_section=page_section)
+    c.block.publish(UserFactory())
+    assert (3, 3) == _versions(page_section)
+
+
+@pytest.mark.django_db
+def test_version_publish_many():
+    page_section = PageSectionFactory()
+    c1 = TitleFactory(block__page_section=page_section)
+    c2 = TitleFactory(block__page_section=page_section)
+    publish_many([c1.block, c2.block], UserFactory())
+    assert (4, 4) == _versions(page_section)
+
+
+@pytest.mark.django_db
+def test_version_remove():
+    page_section = PageSectionFactory()
+    c = TitleFactory(block__page_section=page_section)
+    c.block.remove(UserFactory())
+    assert (3, 3) == _versions(page_section)
+
+
+@pytest.mark.django_db
+def test_version_page_save():
+    """Saving a (stale) page must not change the version."""
+    page_section = PageSectionFactory()
+    page = Page.objects.get(pk=page_section.page.pk)
+    TitleFactory(block__page_section=page_section)
+    page.name = 'Orange'
+    page.save()
+    page.refresh_from_db()
+    assert 'Orange' == page.name
+    assert 2 == page.version
+
+
+@pytest.mark.django_db
+def test_version_refresh_sections_from_template():
+    template = TemplateFactory()
+    TemplateSectionFactory(template=template, section=SectionFactory())
+    page_1 = PageFactory(template=template)
+    page_2 = PageFactory()
+    Page.objects.refresh_sections_from_template(template)
+    assert 2 == Page.objects.version(page_1.slug, page_1.slug_menu)
+    assert 1 == Page.objects.version(page_2.slug, page_2.slug_menu)
+    # nothing has changed
+    Page.objects.refresh_sections_from_template(template)
+    assert 2 == Page.objects.version(page_1.slug, page_1.slug_menu)
@@ -0,0 +1,122 @@
+# -*- encoding: utf-8 -*-
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from block.models import BlockError, publish_many
+from block.tests.factories import (
+    ImageFactory,
+    PageFactory,
+    PageSectionFactory,
+    SectionFactory,
+)
+from example_block.models import Title, TitleImage
+from example_block.tests.factories import TitleFactory
+from login.tests.factories import UserFactory
+
+
+def _page_section(page):
+    return PageSectionFactory(
+        page=page,
+        section=SectionFactory(block_app='example_block', block_model='Title'),
+    )
+
+
+def _query_count(count):
+    user = UserFactory()
+    page = PageFactory()
+    page_section = _page_section(page)
+    blocks = [
+        TitleFactory(block__page_section=page_section).block
+        for x in range(count)
+    ]
+    with CaptureQueriesContext(connection) as queries:
+        publish_many(blocks, user)
+    return len(queries)
+
+
+@pytest.mark.django_db
+def test_publish_many():
+    user = UserFactory()
+    c1 = TitleFactory(title='a')
+    c2 = TitleFactory(title='b')
+    TitleImage.objects.create(content=c1, image=ImageFactory(), order=1)
+    publish_many([c1.block, c2.block], user)
+    c1.refresh_from_db()
+    assert c1.is_pending_pushed is True
+    published = Title.objects.published(c1.block.page_section).get(
+        block=c1.block
+    )
+    assert 'a' == published.title
+    assert user == published.user_moderated
+    assert 1 == published.ordered_slideshow().count()
+    assert Title.objects.get(block=c2.block, moderate_state__slug='published')
+
+
+@pytest.mark.django_db
+def test_publish_many_again():
+    """Publishing again removes the previously published content."""
+    user = UserFactory()
+    c = TitleFactory(title='a')
+    publish_many([c.block], user)
+    c.refresh_from_db()
+    c.title = 'b'
+    c.set_pending_edit()
+    c.save()
+    publish_many([c.block], user)
+    result = [
+        (obj.title, obj.moderate_state.slug)
+        for obj in Title.objects.filter(block=c.block).order_by('title')
+    ]
+    assert [
+        ('a', 'removed'), ('b', 'pending'), ('b', 'published')
+    ] == sorted(result)
+
+
+@pytest.mark.django_db
+def test_publish_many_not_pending():
+    user = UserFactory()
+    c = TitleFactory()
+    c.block.publish(user)
+    c.block.remove(user)
+    with pytest.raises(BlockError):
+        publish_many([c.block], user)
+
+
+@pytest.mark.django_db
+def test_publish_many_query_count():
+    """The query count should not depend on the number of blocks."""
+    assert _query_count(1) == _query_count(5)
+
+
+@pytest.mark.django_db
+def test_page_publish():
+    """Only publish content which has been added or edited."""
+    user = UserFactory()
+    page = PageFactory()
+    c1 = TitleFactory(block__page_section=_page_section(page))
+    c2 = TitleFactory(block__page_section=_page_section(page))
+    c1.block.publish(user)
+    c1.refresh_from_db()
+    modified = c1.block.content.get(moderate_state__slug='published').pk
+    page.publish(user)
+    c2.refresh_from_db()
+    assert c2.is_pending_pushed is True
+    # 'c1' was not edited, so it is not published again
+    assert modified == c1.block.content.get(
+        moderate_state__slug='published'
+    ).pk
+
+
+@pytest.mark.django_db
+def test_page_section_publish():
+    user = UserFactory()
+    page = PageFactory()
+    c1 = TitleFactory(block__page_section=_page_section(page))
+    c2 = TitleFactory(block__page_section=_page_section(page))
+    c1.block.page_section.publish(user)
+    c1.refresh_from_db()
+    c2.refresh_from_db()
+    assert c1.is_pending_pushed is True
+    assert c2.is_pending_added is True
@@ -2,6 +2,8 @@
 import pytest
 
 from django.core.urlresolvers import NoReverseMatch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from block.tests.factories import PageFactory
 from block.models import (
@@ -127,3 +129,38 @@ def test_init_pages_repeat():
     Url.objects.init_pages()
     result = [item.title for item in Url.objects.urls()]
     assert ['a', 'b'] == result
+
+
+@pytest.mark.django_db
+def test_init_pages_page():
+    """Only check one page."""
+    page = PageFactory(name='a', slug='info', slug_menu='')
+    PageFactory(name='b', slug='info', slug_menu='data')
+    Url.objects.init_pages(page)
+    result = [item.title for item in Url.objects.urls()]
+    assert ['a'] == result
+
+
+@pytest.mark.django_db
+def test_init_pages_title():
+    page = PageFactory(name='a', slug='info', slug_menu='')
+    PageFactory(name='b', slug='info', slug_menu='data')
+    Url.objects.init_pages()
+    page.name = 'c'
+    page.save()
+    Url.objects.init_pages()
+    result = [item.title for item in Url.objects.urls()]
+    assert ['b', 'c'] == result
+
+
+@pytest.mark.django_db
+def test_init_pages_query_count():
+    """The query count does not depend on the number of pages."""
+    counts = []
+    for count in (2, 10):
+        for x in range(count):
+            PageFactory(slug_menu='')
+        with CaptureQueriesContext(connection) as queries:
+            Url.objects.init_pages()
+        counts.append(len(queries))
+    assert counts[0] == counts[1]
@@ -4,6 +4,7 @@ import PIL
 import pytest
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 
 from block.models import (
     BlockError,
@@ -374,3 +375,22 @@ def test_wizard_image_upload_single(client):
     assert content.picture.deleted is False
     # check an image has been added to the database
     assert 2 == Image.objects.count()
+
+
+@pytest.mark.django_db
+@override_settings(BLOCK_UPLOAD_MAX_SIZE=10)
+def test_wizard_image_upload_too_large(client):
+    content = TitleFactory()
+    user = UserFactory(is_staff=True)
+    assert client.login(username=user.username, password=TEST_PASSWORD) is True
+    url = url_image_single(content, 'block.wizard.image.upload')
+    data = {
+        'add_to_library': True,
+        'image': test_file(),
+        'title': 'Cricket',
+    }
+    response = client.post(url, data)
+    assert 200 == response.status_code
+    errors = response.context['form'].errors
+    assert 'The file is too large' in ' '.join(errors['image'])
+    assert 0 == Image.objects.count()
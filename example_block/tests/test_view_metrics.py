@@ -0,0 +1,102 @@
+# -*- encoding: utf-8 -*-
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from block.metrics import RequestMetrics, request_metrics
+from block.models import PaginatedSection
+from login.tests.factories import UserFactory
+
+from example_block.tests.factories import (
+    TitleFactory,
+    title_page_section,
+)
+
+
+METRICS = []
+
+
+def metrics_callback(request, metrics):
+    METRICS.append(metrics)
+
+
+class TestViewMetrics(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        del METRICS[:]
+        page_section = title_page_section()
+        self.page = page_section.page
+        self.section = page_section.section
+        TitleFactory(block__page_section=page_section).block.publish(
+            UserFactory()
+        )
+
+    def test_no_header(self):
+        response = self.client.get(self.page.get_absolute_url())
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(
+        BLOCK_METRICS_CALLBACK=(
+            'example_block.tests.test_view_metrics.metrics_callback'
+        )
+    )
+    def test_callback(self):
+        response = self.client.get(self.page.get_absolute_url())
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(METRICS))
+        metrics = METRICS[0]
+        self.assertGreater(metrics.query_count, 0)
+        self.assertIn('section-body', metrics.timings)
+        self.assertGreater(metrics.total_ms, 0)
+
+    @override_settings(BLOCK_PAGE_CACHE_TIMEOUT=60)
+    def test_signal_page_cache(self):
+        result = []
+
+        def _receiver(sender, request, metrics, **kwargs):
+            result.append(metrics.cache)
+
+        request_metrics.connect(_receiver)
+        try:
+            url = self.page.get_absolute_url()
+            self.client.get(url)
+            self.client.get(url)
+        finally:
+            request_metrics.disconnect(_receiver)
+        self.assertEqual([{'page': False}, {'page': True}], result)
+
+    @override_settings(BLOCK_SERVER_TIMING=True)
+    def test_server_timing(self):
+        response = self.client.get(self.page.get_absolute_url())
+        self.assertEqual(200, response.status_code)
+        header = response['Server-Timing']
+        self.assertIn('db;dur=', header)
+        self.assertIn('render;dur=', header)
+        self.assertIn('section-body;dur=', header)
+
+    @override_settings(
+        BLOCK_METRICS_CALLBACK=(
+            'example_block.tests.test_view_metrics.metrics_callback'
+        )
+    )
+    def test_section_paginated(self):
+        """The query for a paginated section runs in the view."""
+        self.section.paginated = (
+            PaginatedSection.objects.create_paginated_section(2, 'order')
+        )
+        self.section.save()
+        response = self.client.get(self.page.get_absolute_url())
+        self.assertEqual(200, response.status_code)
+        self.assertIsInstance(response.context['body_list'].object_list, list)
+        self.assertIn('section-body', METRICS[0].timings)
+
+    def test_sections(self):
+        """The time for a shared query is divided between the sections."""
+        metrics = RequestMetrics()
+        with metrics.sections(['body', 'footer']):
+            pass
+        self.assertEqual(
+            metrics.timings['section-body'], metrics.timings['section-footer']
+        )
@@ -0,0 +1,80 @@
+# -*- encoding: utf-8 -*-
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from block.models import HeaderFooter
+from login.tests.factories import (
+    TEST_PASSWORD,
+    UserFactory,
+)
+
+from example_block.models import Title
+from example_block.tests.factories import (
+    TitleFactory,
+    title_page_section,
+)
+
+
+@override_settings(BLOCK_PAGE_CACHE_TIMEOUT=60)
+class TestViewPageCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        page_section = title_page_section()
+        self.page = page_section.page
+        self.block = TitleFactory(
+            block__page_section=page_section, title='Apple'
+        ).block
+        self.block.publish(self.user)
+
+    def _change_without_signals(self, title):
+        Title.objects.filter(block=self.block).update(title=title)
+
+    def test_cached(self):
+        url = self.page.get_absolute_url()
+        response = self.client.get(url)
+        self.assertContains(response, 'Apple')
+        self._change_without_signals('Orange')
+        response = self.client.get(url)
+        self.assertContains(response, 'Apple')
+
+    def test_header_footer(self):
+        url = self.page.get_absolute_url()
+        self.client.get(url)
+        self._change_without_signals('Orange')
+        header_footer = HeaderFooter.load()
+        header_footer.header = 'Fruit'
+        header_footer.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Orange')
+
+    def test_logged_in(self):
+        """Pages are only cached for anonymous users."""
+        user = UserFactory(is_staff=True)
+        self.assertTrue(
+            self.client.login(username=user.username, password=TEST_PASSWORD)
+        )
+        url = self.page.get_absolute_url()
+        self.client.get(url)
+        self._change_without_signals('Orange')
+        response = self.client.get(url)
+        self.assertContains(response, 'Orange')
+
+    def test_publish(self):
+        url = self.page.get_absolute_url()
+        self.client.get(url)
+        pending = self.block.get_pending()
+        pending.title = 'Orange'
+        pending.save()
+        self.block.publish(self.user)
+        response = self.client.get(url)
+        self.assertContains(response, 'Orange')
+
+    def test_remove(self):
+        url = self.page.get_absolute_url()
+        self.client.get(url)
+        self.block.remove(self.user)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Apple')
@@ -0,0 +1,105 @@
+# -*- encoding: utf-8 -*-
+from django.core.cache import cache
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from block.models import Page
+from login.tests.factories import (
+    TEST_PASSWORD,
+    UserFactory,
+)
+
+from example_block.tests.factories import (
+    TitleFactory,
+    title_page_section,
+)
+
+
+@override_settings(BLOCK_PAGE_CACHE_TIMEOUT=60)
+class TestViewPageConditional(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserFactory()
+        page_section = title_page_section()
+        self.page = page_section.page
+        self.block = TitleFactory(
+            block__page_section=page_section, title='Apple'
+        ).block
+        self.block.publish(self.user)
+        self.url = self.page.get_absolute_url()
+
+    def test_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.url)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(304, response.status_code)
+
+    def test_if_none_match(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        # a '304' response only reads the page version
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+
+    def test_if_none_match_publish(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        pending = self.block.get_pending()
+        pending.title = 'Orange'
+        pending.save()
+        self.block.publish(self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'Orange')
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_if_none_match_version(self):
+        """The content version is read from the database.
+
+        Another process might publish the content without changing the
+        cache generations in this process.
+
+        """
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        Page.objects.filter(pk=self.page.pk).update(version=F('version') + 1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    def test_logged_in(self):
+        """The page for a logged in user is not versioned."""
+        user = UserFactory(is_staff=True)
+        self.assertTrue(
+            self.client.login(username=user.username, password=TEST_PASSWORD)
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn('ETag', response)
+
+    def test_querystring(self):
+        """Each page of a paginated section has a different version."""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response = self.client.get(
+            self.url, {'body-page': 2}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+
+    @override_settings(BLOCK_PAGE_CACHE_TIMEOUT=0)
+    def test_page_cache_disabled(self):
+        """The page is not versioned unless the page cache is enabled."""
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        self.assertNotIn('ETag', response)
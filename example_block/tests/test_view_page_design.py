@@ -0,0 +1,74 @@
+# -*- encoding: utf-8 -*-
+from django.db.models.query import QuerySet
+from django.test import RequestFactory, TestCase
+
+from block.models import ContentManager
+from block.views import PageDesignView, _batched
+from login.tests.factories import UserFactory
+
+from example_block.tests.factories import (
+    TitleFactory,
+    title_page_section,
+)
+
+
+class PublishedManager(ContentManager):
+    """Override ``published`` (the sections can't be loaded together)."""
+
+    def published(self, page_section):
+        return super().published(page_section).order_by('-order')
+
+
+class PublishedSectionsManager(PublishedManager):
+
+    def published_sections(self, page_sections):
+        return super().published_sections(page_sections).order_by('-order')
+
+
+class OldPageDesignView(PageDesignView):
+    """Override ``get_section_queryset`` (without the ``cursor``)."""
+
+    def get_section_queryset(self, page_section, page_number):
+        qs = super().get_section_queryset(page_section, page_number)
+        return qs.filter(title='Apple')
+
+
+class TestViewPageDesign(TestCase):
+
+    def setUp(self):
+        page_section = title_page_section()
+        self.page = page_section.page
+        TitleFactory(block__page_section=page_section, title='Apple')
+        TitleFactory(block__page_section=page_section, title='Orange')
+
+    def _context(self, view_class):
+        request = RequestFactory().get('/')
+        request.user = UserFactory(is_staff=True)
+        response = view_class.as_view()(request, page=self.page.slug)
+        self.assertEqual(200, response.status_code)
+        return response.context_data
+
+    def test_section_list(self):
+        result = self._context(PageDesignView)['body_list']
+        self.assertIsInstance(result, QuerySet)
+        self.assertEqual(2, result.count())
+        self.assertEqual(1, result.filter(title='Apple').count())
+
+    def test_get_section_queryset_override(self):
+        result = self._context(OldPageDesignView)['body_list']
+        self.assertEqual(['Apple'], [x.title for x in result])
+
+    def test_batched(self):
+        class Content:
+            objects = ContentManager()
+
+        class Published:
+            objects = PublishedManager()
+
+        class PublishedSections:
+            objects = PublishedSectionsManager()
+
+        self.assertTrue(_batched(Content, 'published'))
+        self.assertFalse(_batched(Published, 'published'))
+        self.assertTrue(_batched(Published, 'pending'))
+        self.assertTrue(_batched(PublishedSections, 'published'))
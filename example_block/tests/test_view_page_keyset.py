@@ -0,0 +1,103 @@
+# -*- encoding: utf-8 -*-
+from django.test import TestCase
+
+from block.models import PaginatedSection
+from block.pagination import KeysetPage, cursor_param
+from block.tests.factories import (
+    PageFactory,
+    PageSectionFactory,
+    SectionFactory,
+    TemplateFactory,
+)
+from login.tests.factories import UserFactory
+
+from example_block.tests.factories import TitleFactory
+
+
+class TestViewPageKeyset(TestCase):
+
+    def _page(self, items_per_page, mode, page=None):
+        user = UserFactory()
+        if page is None:
+            page = PageFactory(
+                slug_menu='',
+                template=TemplateFactory(template_name='example/page.html'),
+            )
+        paginated = PaginatedSection.objects.create_paginated_section(
+            items_per_page, 'order', mode=mode
+        )
+        page_section = PageSectionFactory(
+            page=page,
+            section=SectionFactory(
+                block_app='example_block',
+                block_model='Title',
+                paginated=paginated,
+            ),
+        )
+        for order in range(3):
+            title = TitleFactory(
+                block__page_section=page_section, order=order
+            )
+            title.block.publish(user)
+        return page, '{}_list'.format(page_section.section.slug)
+
+    def test_keyset(self):
+        page, name = self._page(2, PaginatedSection.KEYSET)
+        response = self.client.get(page.get_absolute_url())
+        self.assertEqual(200, response.status_code)
+        result = response.context[name]
+        self.assertIsInstance(result, KeysetPage)
+        self.assertEqual([0, 1], [x.order for x in result])
+        param = cursor_param(name[:-len('_list')])
+        response = self.client.get(
+            page.get_absolute_url(), {param: result.next_cursor}
+        )
+        self.assertEqual(200, response.status_code)
+        result = response.context[name]
+        self.assertEqual([2], [x.order for x in result])
+        self.assertTrue(result.has_previous())
+
+    def test_offset(self):
+        page, name = self._page(2, PaginatedSection.OFFSET)
+        response = self.client.get(page.get_absolute_url(), {'page': 2})
+        self.assertEqual(200, response.status_code)
+        result = response.context[name]
+        self.assertEqual([2], [x.order for x in result])
+
+    def test_items_per_page_zero(self):
+        """If 'items_per_page' is 0, then display all of the items."""
+        page, name = self._page(0, PaginatedSection.OFFSET)
+        response = self.client.get(page.get_absolute_url())
+        self.assertEqual(200, response.status_code)
+        result = response.context[name]
+        self.assertEqual([0, 1, 2], [x.order for x in result])
+
+    def test_two_sections(self):
+        """Each section has its own page parameter."""
+        page, name_1 = self._page(2, PaginatedSection.OFFSET)
+        page, name_2 = self._page(2, PaginatedSection.OFFSET, page)
+        slug_1 = name_1[:-len('_list')]
+        response = self.client.get(
+            page.get_absolute_url(), {'{}-page'.format(slug_1): 2}
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([2], [x.order for x in response.context[name_1]])
+        self.assertEqual(
+            [0, 1], [x.order for x in response.context[name_2]]
+        )
+
+    def test_two_sections_cursor(self):
+        """The cursor for one section is not used by another section."""
+        page, name_1 = self._page(2, PaginatedSection.KEYSET)
+        page, name_2 = self._page(2, PaginatedSection.KEYSET, page)
+        response = self.client.get(page.get_absolute_url())
+        cursor = response.context[name_1].next_cursor
+        response = self.client.get(page.get_absolute_url(), {
+            cursor_param(name_1[:-len('_list')]): cursor,
+            'cursor': cursor,
+        })
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([2], [x.order for x in response.context[name_1]])
+        self.assertEqual(
+            [0, 1], [x.order for x in response.context[name_2]]
+        )
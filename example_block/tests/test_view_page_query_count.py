@@ -0,0 +1,62 @@
+# -*- encoding: utf-8 -*-
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from block.tests.factories import (
+    PageFactory,
+    PageSectionFactory,
+    SectionFactory,
+    TemplateFactory,
+)
+from login.tests.factories import UserFactory
+
+from example_block.tests.factories import TitleFactory
+
+
+class TestViewPageQueryCount(TestCase):
+
+    def _page(self, section_count):
+        user = UserFactory()
+        page = PageFactory(
+            slug_menu='',
+            template=TemplateFactory(template_name='example/page.html'),
+        )
+        for count in range(section_count):
+            page_section = PageSectionFactory(
+                page=page,
+                section=SectionFactory(
+                    block_app='example_block',
+                    block_model='Title',
+                ),
+            )
+            title = TitleFactory(block__page_section=page_section)
+            title.block.publish(user)
+        return page
+
+    def _query_count(self, page):
+        url = page.get_absolute_url()
+        # warm up e.g. the moderate state and content type caches
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        return len(queries)
+
+    def test_query_count_sections(self):
+        """The query count should not depend on the number of sections."""
+        one = self._query_count(self._page(1))
+        many = self._query_count(self._page(5))
+        self.assertEqual(one, many)
+
+    def test_section_list(self):
+        page = self._page(2)
+        response = self.client.get(page.get_absolute_url())
+        self.assertEqual(200, response.status_code)
+        for page_section in page.pagesection_set.all():
+            name = '{}_list'.format(page_section.section.slug)
+            result = response.context[name]
+            self.assertIsInstance(result, QuerySet)
+            self.assertEqual(1, len(result))
+            self.assertTrue(result[0].is_published)